@@ -0,0 +1,91 @@
+"""
+Content-addressed reuse of AI analyses.
+
+An analysis is identified by a hash of the complete OpenAI request: the
+prompt built from the collected student/course data plus the model and its
+sampling parameters. If a stored AIAnalysis has the same hash, the data it
+was generated from has not changed and it is served instead of calling
+OpenAI again.
+
+Course and overall analyses are also stored with a fingerprint of the
+data they were built from, computed from local data only (see
+``course_state_hash`` and ``student_state_hash``), so unchanged data is
+answered before any of it is collected and without using the limit.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import AIAnalysis
+
+logger = logging.getLogger(__name__)
+
+# Stored analyses older than this are regenerated even if the data is unchanged.
+AI_ANALYSIS_CACHE_MAX_AGE = getattr(settings, 'AI_ANALYSIS_CACHE_MAX_AGE', 7 * 24 * 3600)
+
+stats = {'hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+
+def request_hash(openai_request):
+    """sha256 of a chat completion request in canonical JSON form."""
+    canonical = json.dumps(openai_request, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def _record(hit, analysis_type, email):
+    with _stats_lock:
+        stats['hits' if hit else 'misses'] += 1
+        hits, misses = stats['hits'], stats['misses']
+    logger.info(
+        f"AI analysis cache {'hit' if hit else 'miss'} for {analysis_type} of {email} "
+        f"(hits={hits}, misses={misses})"
+    )
+
+
+def find_analysis(email, analysis_type, input_hash, course_id=None):
+    """Return the stored AIAnalysis generated from identical input, or None."""
+    cutoff = timezone.now() - timedelta(seconds=AI_ANALYSIS_CACHE_MAX_AGE)
+    analysis = AIAnalysis.objects.filter(
+        student_email=email,
+        analysis_type=analysis_type,
+        course_id=course_id,
+        input_hash=input_hash,
+        created_at__gte=cutoff,
+    ).first()
+
+    _record(analysis is not None, analysis_type, email)
+    return analysis
+
+
+def _find_by_state(email, analysis_type, fingerprint, course_id=None):
+    if not fingerprint:
+        return None
+
+    cutoff = timezone.now() - timedelta(seconds=AI_ANALYSIS_CACHE_MAX_AGE)
+    analysis = AIAnalysis.objects.filter(
+        student_email=email,
+        analysis_type=analysis_type,
+        course_id=course_id,
+        data_fingerprint=fingerprint,
+        created_at__gte=cutoff,
+    ).first()
+
+    _record(analysis is not None, analysis_type, email)
+    return analysis
+
+
+def find_course_analysis(email, course_id, fingerprint):
+    """Return the stored course analysis based on the same coursework and submissions, or None."""
+    return _find_by_state(email, 'course', fingerprint, course_id)
+
+
+def find_overall_analysis(email, fingerprint):
+    """Return the stored overall summary (live or precomputed) of the same student data, or None."""
+    return _find_by_state(email, 'overall', fingerprint)
@@ -0,0 +1,146 @@
+"""
+Async variant of the AI assistant endpoint.
+
+``AsyncAIAssistantView`` accepts the same requests and returns the same
+responses as ``AIAssistantView``. Served through ``backend/asgi.py``, the
+blocking Classroom collection and ORM calls run in worker threads while
+the OpenAI call is awaited on the event loop, so a single worker process
+holds many analyses in flight without blocking other API requests. The
+request handling itself is ``views.Analysis``, shared with the sync view.
+"""
+
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import AuthenticationFailed
+
+from appuser.authentication import LabJWTAuthentication
+from appuser.permissions import IsLabAdminOrStudent
+from .openai_service import acomplete, astream_completion
+from .streaming import sse_event, wants_stream, event_stream_response
+from .rate_limit import LIMIT_MESSAGE
+from .views import Analysis, AnalysisError
+
+logger = logging.getLogger(__name__)
+
+
+async def run_blocking(fn, *args):
+    """Run blocking ORM or Google API code in a worker thread, off the event loop."""
+    def call():
+        try:
+            return fn(*args)
+        finally:
+            # Worker threads outlive the request; release their DB connection
+            close_old_connections()
+
+    return await sync_to_async(call, thread_sensitive=False)()
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncAIAssistantView(View):
+    """Main AI assistant endpoint, async"""
+
+    async def post(self, request):
+        denied = await run_blocking(self.check_permission, request)
+        if denied is not None:
+            return denied
+
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return JsonResponse({"error": "Invalid JSON body"}, status=400)
+        if not isinstance(data, dict):
+            return JsonResponse({"error": "Request body must be a JSON object"}, status=400)
+
+        analysis = Analysis(request.user, data)
+        stream = wants_stream(request, data)
+
+        stored = await run_blocking(analysis.stored_payload)
+        if stored is not None:
+            return self.stored_response(stored, stream)
+
+        if not await run_blocking(analysis.reserve):
+            return JsonResponse({"error": LIMIT_MESSAGE}, status=429)
+
+        try:
+            response = await self.run_analysis(analysis, stream)
+        except AnalysisError as e:
+            response = JsonResponse({"error": str(e)}, status=e.status_code)
+        except Exception as e:
+            logger.exception(f"Error in AI analysis for {request.user.email}")
+            response = JsonResponse({"error": str(e)}, status=500)
+
+        if response.status_code >= 400:
+            # Nothing was generated; give the slot back
+            await run_blocking(analysis.release)
+        return response
+
+    def check_permission(self, request):
+        """
+        None if IsLabAdminOrStudent grants access, else the error response.
+
+        Answers like DRF: 401 when the request is not authenticated, 403
+        when it is but the permission is refused.
+        """
+        permission = IsLabAdminOrStudent()
+        if permission.has_permission(request, self):
+            return None
+
+        authentication = LabJWTAuthentication()
+        try:
+            authenticated = authentication.authenticate(request) is not None
+        except AuthenticationFailed:
+            authenticated = False
+        if authenticated:
+            return JsonResponse({"detail": "You do not have permission to perform this action."}, status=403)
+
+        response = JsonResponse({"detail": permission.message}, status=401)
+        response['WWW-Authenticate'] = authentication.authenticate_header(request)
+        return response
+
+    def stored_response(self, payload, stream):
+        """Answer with a stored analysis, as JSON or as a single SSE 'done' event."""
+        if stream:
+            return event_stream_response(_single_event('done', payload))
+        return JsonResponse(payload)
+
+    async def run_analysis(self, analysis, stream):
+        """Async AIAssistantView.run_analysis."""
+        await run_blocking(analysis.prepare)
+
+        cached = await run_blocking(analysis.cached_payload)
+        if cached:
+            return self.stored_response(cached, stream)
+
+        if not stream:
+            result = await acomplete(analysis.openai_request)
+            return JsonResponse(await run_blocking(analysis.finish, result))
+
+        async def events():
+            saved = False
+            try:
+                result = {}
+                async for text in astream_completion(analysis.openai_request, result):
+                    yield sse_event('token', {'text': text})
+                payload = await run_blocking(analysis.finish, result)
+                saved = True
+                yield sse_event('done', payload)
+            except Exception as e:
+                logger.exception(f"Error in streamed AI analysis for {analysis.user.email}")
+                yield sse_event('error', {'error': str(e)})
+            finally:
+                # Also reached when the client disconnects mid-stream (aclose)
+                if not saved:
+                    await run_blocking(analysis.release)
+
+        return event_stream_response(events())
+
+
+async def _single_event(event, data):
+    yield sse_event(event, data)
@@ -1,10 +1,31 @@
-from classroom.google_service import get_classroom_service
+from classroom.google_service import (
+    get_classroom_service,
+    get_my_submissions_by_coursework,
+    iterate_list,
+    LIST_PAGE_SIZE,
+)
+from classroom.google_batch import GoogleBatch
+from classroom import cache as classroom_cache
+from classroom import mirror
 from classroom_admin.models import DisplayedCourse
 from user_management.models import StudentIndividualPlan
+from django.conf import settings
+from django.core.cache import cache
+import hashlib
+import json
 import logging
 
 logger = logging.getLogger(__name__)
 
+# How long the state of a course that isn't mirrored is remembered for the
+# stored-analysis fingerprints; long enough for a nightly precomputed summary
+# to be served the next day. A Classroom push notification for the course
+# bumps its cache generation and drops the remembered state sooner.
+COURSE_STATE_MAX_AGE = getattr(settings, 'AI_COURSE_STATE_MAX_AGE', 24 * 3600)
+
+# Remembered state of a course the student cannot see
+NOT_ENROLLED = 'not enrolled'
+
 
 def collect_student_data(user):
     """Gather all student data for AI analysis"""
@@ -12,48 +33,95 @@ def collect_student_data(user):
     try:
         service = get_classroom_service(user.email)
         
-        # Get visible courses
-        visible_courses = DisplayedCourse.objects.all()
+        # Get visible courses (in a stable order, so unchanged data gives an identical prompt)
+        visible_courses = DisplayedCourse.objects.order_by('course_id')
         course_ids = [c.course_id for c in visible_courses]
+        # Taken before fetching, so data is never stored under a newer generation
+        parts = {course_id: classroom_cache.course_parts(course_id) for course_id in course_ids}
+        
+        # Course records, coursework and the student's submissions for every
+        # visible course go out together in batched round trips
+        batch = GoogleBatch(service)
+        cached_coursework = {}
+        mirrored_courses = {}
+        for course_id in course_ids:
+            # Courses kept up to date by the sync worker are answered from the DB
+            mirrored = mirror.get_student_course(course_id, user.email)
+            if mirrored is not None:
+                mirrored_courses[course_id] = mirrored
+                continue
+            
+            batch.add((course_id, 'course'), service.courses().get(id=course_id))
+            coursework = classroom_cache.get_cached(user.email, 'coursework', *parts[course_id])
+            if coursework is not None:
+                cached_coursework[course_id] = coursework
+            else:
+                batch.add((course_id, 'coursework'), service.courses().courseWork().list(
+                    courseId=course_id,
+                    pageSize=LIST_PAGE_SIZE
+                ))
+            batch.add((course_id, 'submissions'), service.courses().courseWork().studentSubmissions().list(
+                courseId=course_id,
+                courseWorkId='-',
+                userId='me',
+                pageSize=LIST_PAGE_SIZE
+            ))
+        results, errors = batch.execute()
+        
+        for course_id in course_ids:
+            if course_id in mirrored_courses:
+                continue
+            if course_id in cached_coursework:
+                results[(course_id, 'coursework')] = {'courseWork': cached_coursework[course_id]}
+            elif (course_id, 'coursework') in results:
+                coursework_response = results[(course_id, 'coursework')]
+                coursework_list = coursework_response.get('courseWork', [])
+                if coursework_response.get('nextPageToken'):
+                    # Continue from the batched first page
+                    coursework_list = coursework_list + list(iterate_list(
+                        service.courses().courseWork(),
+                        'courseWork',
+                        courseId=course_id,
+                        pageToken=coursework_response['nextPageToken']
+                    ))
+                    results[(course_id, 'coursework')] = {'courseWork': coursework_list}
+                classroom_cache.set_cached(user.email, 'coursework', coursework_list, *parts[course_id])
         
         courses_data = []
         
         for course_id in course_ids:
             try:
-                # Get course details
-                course = service.courses().get(id=course_id).execute()
-                
-                # Get coursework
-                coursework_response = service.courses().courseWork().list(
-                    courseId=course_id
-                ).execute()
-                coursework_list = coursework_response.get('courseWork', [])
+                if course_id in mirrored_courses:
+                    mirrored = mirrored_courses[course_id]
+                    course = mirrored['course']
+                    coursework_list = mirrored['coursework']
+                    submissions_by_work = mirrored['submissions']
+                else:
+                    course, coursework_list, submissions_by_work = _batched_course(
+                        service, course_id, results, errors
+                    )
+                    classroom_cache.set_cached(user.email, 'submissions', submissions_by_work, *parts[course_id])
+                    _remember_course_state(
+                        user.email, parts[course_id], _hash_course_state(coursework_list, submissions_by_work)
+                    )
                 
                 open_count = 0
                 graded_count = 0
                 grades = []
                 
                 for work in coursework_list:
-                    try:
-                        submissions_response = service.courses().courseWork().studentSubmissions().list(
-                            courseId=course_id,
-                            courseWorkId=work['id'],
-                            userId='me'
-                        ).execute()
-                        
-                        submissions = submissions_response.get('studentSubmissions', [])
-                        if submissions:
-                            sub = submissions[0]
-                            state = sub.get('state')
-                            
-                            if state in ['NEW', 'CREATED']:
-                                open_count += 1
-                            elif state == 'RETURNED':
-                                graded_count += 1
-                                if sub.get('assignedGrade'):
-                                    grades.append(sub['assignedGrade'])
-                    except:
+                    sub = submissions_by_work.get(work['id'])
+                    if not sub:
                         continue
+                    
+                    state = sub.get('state')
+                    
+                    if state in ['NEW', 'CREATED']:
+                        open_count += 1
+                    elif state == 'RETURNED':
+                        graded_count += 1
+                        if sub.get('assignedGrade'):
+                            grades.append(sub['assignedGrade'])
                 
                 # Calculate average grade
                 average_grade = sum(grades) / len(grades) if grades else None
@@ -68,8 +136,16 @@ def collect_student_data(user):
                 
             except Exception as e:
                 logger.warning(f"Error fetching course {course_id}: {e}")
+                if course_id not in mirrored_courses and _is_not_visible(e):
+                    # Left out of the summary, and of its fingerprint, for as long as that holds
+                    _remember_course_state(user.email, parts[course_id], NOT_ENROLLED)
                 continue
         
+        logger.info(
+            f"Collected {len(courses_data)}/{len(course_ids)} courses for {user.email} "
+            f"({len(mirrored_courses)} from the local mirror, {batch.stats['batches']} batch requests)"
+        )
+        
         # Get individual plan
         plan = StudentIndividualPlan.objects.filter(
             student_email=user.email
@@ -90,55 +166,79 @@ def collect_student_data(user):
         raise
 
 
+def _batched_course(service, course_id, results, errors):
+    """Pick one course's course record, coursework and submissions out of batch results."""
+    failed = [part for part in ('course', 'coursework', 'submissions')
+              if (course_id, part) not in results]
+    if failed:
+        raise errors.get((course_id, failed[0])) or Exception(f"Missing {failed[0]} response")
+    
+    course = results[(course_id, 'course')]
+    coursework_list = results[(course_id, 'coursework')].get('courseWork', [])
+    
+    submissions_response = results[(course_id, 'submissions')]
+    if submissions_response.get('nextPageToken'):
+        # More than one page of submissions; fetch the rest the slow way
+        submissions_by_work = get_my_submissions_by_coursework(service, course_id)
+    else:
+        submissions_by_work = {}
+        for sub in submissions_response.get('studentSubmissions', []):
+            submissions_by_work.setdefault(sub.get('courseWorkId'), sub)
+    
+    return course, coursework_list, submissions_by_work
+
+
 def collect_course_data(user, course_id):
     """Gather data for a specific course"""
     
     try:
-        service = get_classroom_service(user.email)
-        
-        # Get course
-        course = service.courses().get(id=course_id).execute()
-        
-        # Get coursework
-        coursework_response = service.courses().courseWork().list(
-            courseId=course_id
-        ).execute()
-        coursework_list = coursework_response.get('courseWork', [])
+        mirrored = mirror.get_student_course(course_id, user.email)
+        if mirrored is not None:
+            # Kept up to date by the sync worker; no Classroom calls needed
+            course = mirrored['course']
+            coursework_list = mirrored['coursework']
+            submissions_by_work = mirrored['submissions']
+        else:
+            service = get_classroom_service(user.email)
+            parts = classroom_cache.course_parts(course_id)
+            
+            # Get course
+            course = service.courses().get(id=course_id).execute()
+            
+            # Get coursework (read-through cache)
+            coursework_list = classroom_cache.get_coursework(service, user.email, course_id)
+            
+            # Submissions (read-through cache, dropped on submission push notifications)
+            submissions_by_work = classroom_cache.get_my_submissions(service, user.email, course_id)
+            
+            _remember_course_state(user.email, parts, _hash_course_state(coursework_list, submissions_by_work))
         
         open_assignments = []
         graded_assignments = []
         recent_grades = []
         
         for work in coursework_list:
-            try:
-                submissions_response = service.courses().courseWork().studentSubmissions().list(
-                    courseId=course_id,
-                    courseWorkId=work['id'],
-                    userId='me'
-                ).execute()
-                
-                submissions = submissions_response.get('studentSubmissions', [])
-                if submissions:
-                    sub = submissions[0]
-                    state = sub.get('state')
-                    
-                    if state in ['NEW', 'CREATED']:
-                        open_assignments.append({
-                            'title': work['title'],
-                            'due_date': work.get('dueDate')
-                        })
-                    elif state == 'RETURNED':
-                        grade = sub.get('assignedGrade')
-                        max_points = work.get('maxPoints')
-                        if grade and max_points:
-                            recent_grades.append(f"{grade}/{max_points}")
-                            graded_assignments.append({
-                                'title': work['title'],
-                                'grade': grade,
-                                'max_points': max_points
-                            })
-            except:
+            sub = submissions_by_work.get(work['id'])
+            if not sub:
                 continue
+            
+            state = sub.get('state')
+            
+            if state in ['NEW', 'CREATED']:
+                open_assignments.append({
+                    'title': work['title'],
+                    'due_date': work.get('dueDate')
+                })
+            elif state == 'RETURNED':
+                grade = sub.get('assignedGrade')
+                max_points = work.get('maxPoints')
+                if grade and max_points:
+                    recent_grades.append(f"{grade}/{max_points}")
+                    graded_assignments.append({
+                        'title': work['title'],
+                        'grade': grade,
+                        'max_points': max_points
+                    })
         
         return {
             'name': course['name'],
@@ -150,4 +250,78 @@ def collect_course_data(user, course_id):
         
     except Exception as e:
         logger.exception(f"Error collecting course data for {course_id}")
-        raise
\ No newline at end of file
+        raise
+
+
+def _hash_course_state(coursework_list, submissions_by_work):
+    coursework = sorted((w['id'], w.get('updateTime', '')) for w in coursework_list)
+    submissions = sorted(
+        (work_id, s.get('state', ''), str(s.get('assignedGrade')), s.get('updateTime', ''))
+        for work_id, s in submissions_by_work.items()
+    )
+    return hashlib.sha256(json.dumps([coursework, submissions]).encode('utf-8')).hexdigest()
+
+
+def _is_not_visible(error):
+    """True for the Classroom errors of a course the user is not a member of"""
+    return getattr(getattr(error, 'resp', None), 'status', None) in (403, 404)
+
+
+def _course_state_key(email, parts):
+    return classroom_cache.cache_key(email, 'course_state', *parts)
+
+
+def _remember_course_state(email, parts, state):
+    cache.set(_course_state_key(email, parts), state, timeout=COURSE_STATE_MAX_AGE)
+
+
+def _local_course_state(user, course_id):
+    """course_state_hash, or NOT_ENROLLED when the student was found not to see the course"""
+    mirrored = mirror.get_student_course(course_id, user.email)
+    if mirrored is not None:
+        return _hash_course_state(mirrored['coursework'], mirrored['submissions'])
+    
+    parts = classroom_cache.course_parts(course_id)
+    coursework_list = classroom_cache.get_cached(user.email, 'coursework', *parts)
+    submissions_by_work = classroom_cache.get_cached(user.email, 'submissions', *parts)
+    if coursework_list is not None and submissions_by_work is not None:
+        return _hash_course_state(coursework_list, submissions_by_work)
+    # Past the Classroom cache TTL: the state recorded when the data was last fetched
+    return cache.get(_course_state_key(user.email, parts))
+
+
+def course_state_hash(user, course_id):
+    """
+    Hash of a student's coursework and submissions in a course (the stored "fingerprint").
+    
+    Computed only from local data, never from live calls: the mirror, the
+    Classroom cache, or else the hash remembered when the course was last
+    collected (for COURSE_STATE_MAX_AGE, or until the course changes).
+    Returns None when none of them has the course's data.
+    """
+    state = _local_course_state(user, course_id)
+    return None if state == NOT_ENROLLED else state
+
+
+def student_state_hash(user):
+    """
+    Hash of everything the overall summary prompt is built from.
+    
+    Covers the student's name, plan status and, for every visible course,
+    its name and course_state_hash (courses the mirror or the last collection
+    showed the student is not enrolled in count as such). Local data only,
+    like course_state_hash; returns None if any course's data is not
+    available locally.
+    """
+    courses = []
+    for course_id, name in DisplayedCourse.objects.order_by('course_id').values_list('course_id', 'name'):
+        state = _local_course_state(user, course_id)
+        if state is None:
+            if mirror.is_on_roster(course_id, user.email) is not False:
+                return None
+            state = NOT_ENROLLED
+        courses.append([course_id, name, state])
+    
+    has_plan = StudentIndividualPlan.objects.filter(student_email=user.email).exists()
+    name = user.first_name or user.email.split('@')[0]
+    return hashlib.sha256(json.dumps([name, user.email, has_plan, courses]).encode('utf-8')).hexdigest()
@@ -0,0 +1,62 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from ai_assistant.openai_service import LocalCompletionBackend, complete
+from ai_assistant.precompute import (
+    PRECOMPUTE_CONCURRENCY,
+    PRECOMPUTE_RETRIES,
+    precompute_overall_summaries,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Precompute the overall AI summary of every active student (run nightly)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=PRECOMPUTE_CONCURRENCY,
+            help=f"Students processed at once (default: {PRECOMPUTE_CONCURRENCY})",
+        )
+        parser.add_argument(
+            "--retries",
+            type=int,
+            default=PRECOMPUTE_RETRIES,
+            help=f"Retries per student after a failure (default: {PRECOMPUTE_RETRIES})",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Regenerate summaries even if the student's data is unchanged",
+        )
+        parser.add_argument(
+            "--student",
+            action="append",
+            dest="emails",
+            help="Only this student's email (can be repeated)",
+        )
+        parser.add_argument(
+            "--backend",
+            choices=["openai", "local"],
+            default="openai",
+            help="Completion backend; 'local' answers without calling OpenAI (tests, development)",
+        )
+
+    def handle(self, *args, **options):
+        complete_fn = LocalCompletionBackend().complete if options["backend"] == "local" else complete
+
+        stats = precompute_overall_summaries(
+            complete_fn=complete_fn,
+            concurrency=options["concurrency"],
+            retries=options["retries"],
+            force=options["force"],
+            emails=options["emails"],
+        )
+        self.stdout.write(
+            f"Precomputed overall summaries: {stats['generated']} generated, "
+            f"{stats['unchanged']} unchanged, {stats['failed']} failed"
+        )
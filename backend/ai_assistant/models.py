@@ -14,11 +14,20 @@ class AIAnalysis(models.Model):
     student_email = models.EmailField()
     analysis_type = models.CharField(max_length=20, choices=ANALYSIS_TYPES)
     course_id = models.CharField(max_length=255, null=True, blank=True)  # For course-specific
+    # sha256 of the OpenAI request the result was generated from (see analysis_cache)
+    input_hash = models.CharField(max_length=64, blank=True, default='')
+    # Course and overall analyses: fingerprint of the local data they were based on
+    # (course_state_hash / student_state_hash), matched before any data is collected
+    data_fingerprint = models.CharField(max_length=64, blank=True, default='')
     result = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['student_email', 'analysis_type', 'input_hash']),
+            models.Index(fields=['student_email', 'course_id', 'data_fingerprint']),
+        ]
     
     def __str__(self):
         return f"{self.student_email} - {self.analysis_type} - {self.created_at}"
@@ -33,4 +42,18 @@ class AIUsageLog(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['student_email', 'created_at']),
+        ]
+
+
+class AIUsageCounter(models.Model):
+    """Per-student analysis count for the current month; its row lock serializes reservations"""
+    
+    student_email = models.EmailField(unique=True)
+    window_start = models.DateTimeField()
+    count = models.IntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.student_email} - {self.count} since {self.window_start}"
\ No newline at end of file
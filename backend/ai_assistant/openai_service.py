@@ -1,14 +1,33 @@
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from django.conf import settings
+import asyncio
 import logging
+import threading
+import weakref
 
 logger = logging.getLogger(__name__)
 
 client = OpenAI(api_key=settings.OPENAI_API_KEY)
 
+_async_clients = weakref.WeakKeyDictionary()
 
-def analyze_overall_performance(student_data):
-    """Generate overall performance summary"""
+
+def get_async_client():
+    """
+    AsyncOpenAI client for the running event loop.
+
+    Its connection pool cannot be shared between loops: under ASGI there is
+    one per worker, under WSGI each async request gets a short-lived loop.
+    """
+    loop = asyncio.get_running_loop()
+    async_client = _async_clients.get(loop)
+    if async_client is None:
+        async_client = _async_clients[loop] = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+    return async_client
+
+
+def overall_performance_request(student_data):
+    """Build the chat completion request for the overall performance summary"""
     
     courses_summary = ""
     for course in student_data.get('courses', []):
@@ -42,37 +61,27 @@ Keep the response concise, actionable, and encouraging. Use a supportive, profes
 Format with clear headers and bullet points.
 """
     
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a supportive and knowledgeable PhD academic advisor. Provide concise, actionable advice. Always respond in Bulgarian language."
-                },
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=600,
-            temperature=0.7
-        )
-        
-        result = response.choices[0].message.content
-        tokens_used = response.usage.total_tokens
-        
-        logger.info(f"OpenAI analysis generated. Tokens used: {tokens_used}")
-        
-        return {
-            'summary': result,
-            'tokens_used': tokens_used
-        }
-        
-    except Exception as e:
-        logger.exception(f"Error calling OpenAI API: {e}")
-        raise
+    return {
+        "model": "gpt-4o-mini",
+        "messages": [
+            {
+                "role": "system",
+                "content": "You are a supportive and knowledgeable PhD academic advisor. Provide concise, actionable advice. Always respond in Bulgarian language."
+            },
+            {"role": "user", "content": prompt}
+        ],
+        "max_tokens": 600,
+        "temperature": 0.7,
+    }
 
 
-def analyze_course_performance(student_data, course_data):
-    """Generate course-specific insights"""
+def analyze_overall_performance(student_data):
+    """Generate overall performance summary"""
+    return complete(overall_performance_request(student_data))
+
+
+def course_performance_request(student_data, course_data):
+    """Build the chat completion request for course-specific insights"""
     
     prompt = f"""
 You are an AI academic advisor for PhD students.
@@ -94,35 +103,27 @@ Provide:
 Be concise and actionable. Use bullet points.
 """
     
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a supportive PhD academic advisor specializing in course-specific guidance. Always respond in Bulgarian language."
-                },
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=400,
-            temperature=0.7
-        )
-        
-        result = response.choices[0].message.content
-        tokens_used = response.usage.total_tokens
-        
-        return {
-            'summary': result,
-            'tokens_used': tokens_used
-        }
-        
-    except Exception as e:
-        logger.exception(f"Error calling OpenAI API: {e}")
-        raise
+    return {
+        "model": "gpt-4o-mini",
+        "messages": [
+            {
+                "role": "system",
+                "content": "You are a supportive PhD academic advisor specializing in course-specific guidance. Always respond in Bulgarian language."
+            },
+            {"role": "user", "content": prompt}
+        ],
+        "max_tokens": 400,
+        "temperature": 0.7,
+    }
 
 
-def analyze_individual_plan(student_data, plan_data):
-    """Analyze individual plan progress"""
+def analyze_course_performance(student_data, course_data):
+    """Generate course-specific insights"""
+    return complete(course_performance_request(student_data, course_data))
+
+
+def individual_plan_request(student_data, plan_data):
+    """Build the chat completion request for the individual plan analysis"""
     
     prompt = f"""
 You are an AI academic advisor for PhD students.
@@ -144,23 +145,113 @@ Provide:
 Be encouraging and specific.
 """
     
+    return {
+        "model": "gpt-4o-mini",
+        "messages": [
+            {
+                "role": "system",
+                "content": "You are a PhD academic advisor focused on long-term planning and milestone tracking. Always respond in Bulgarian language."
+            },
+            {"role": "user", "content": prompt}
+        ],
+        "max_tokens": 400,
+        "temperature": 0.7,
+    }
+
+
+def plan_chunk_summary_request(chunk, max_tokens):
+    """Build the chat completion request summarizing one chunk of an individual plan"""
+    return {
+        "model": "gpt-4o-mini",
+        "messages": [
+            {
+                "role": "system",
+                "content": "You condense parts of PhD individual plans. Keep research goals, milestones, deadlines, planned publications and courses; drop everything else. Always respond in Bulgarian language."
+            },
+            {"role": "user", "content": chunk}
+        ],
+        "max_tokens": max_tokens,
+        # Summaries are stored and reused; keep them reproducible
+        "temperature": 0,
+    }
+
+
+def analyze_individual_plan(student_data, plan_data):
+    """Analyze individual plan progress"""
+    return complete(individual_plan_request(student_data, plan_data))
+
+
+def complete(request):
+    """
+    Run a chat completion request built by one of the *_request helpers.
+
+    Returns:
+        dict: 'summary' (the generated text) and 'tokens_used'
+    """
+    try:
+        response = client.chat.completions.create(**request)
+        
+        result = response.choices[0].message.content
+        tokens_used = response.usage.total_tokens
+        
+        logger.info(f"OpenAI analysis generated. Tokens used: {tokens_used}")
+        
+        return {
+            'summary': result,
+            'tokens_used': tokens_used
+        }
+        
+    except Exception as e:
+        logger.exception(f"Error calling OpenAI API: {e}")
+        raise
+
+
+def stream_completion(request):
+    """
+    Stream a chat completion request, yielding text fragments as they arrive.
+
+    The generator's return value (``StopIteration.value``, or the result of
+    ``yield from``) is the same dict ``complete`` returns.
+    """
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a PhD academic advisor focused on long-term planning and milestone tracking. Always respond in Bulgarian language."
-                },
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=400,
-            temperature=0.7
+        stream = client.chat.completions.create(
+            **request,
+            stream=True,
+            stream_options={"include_usage": True},
         )
         
+        parts = []
+        tokens_used = 0
+        for chunk in stream:
+            if chunk.usage:
+                # The last chunk carries usage and no choices
+                tokens_used = chunk.usage.total_tokens
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+                yield chunk.choices[0].delta.content
+        
+        logger.info(f"OpenAI analysis streamed. Tokens used: {tokens_used}")
+        
+        return {
+            'summary': ''.join(parts),
+            'tokens_used': tokens_used
+        }
+        
+    except Exception as e:
+        logger.exception(f"Error streaming from OpenAI API: {e}")
+        raise
+
+
+async def acomplete(request):
+    """Async ``complete`` on the AsyncOpenAI client."""
+    try:
+        response = await get_async_client().chat.completions.create(**request)
+        
         result = response.choices[0].message.content
         tokens_used = response.usage.total_tokens
         
+        logger.info(f"OpenAI analysis generated. Tokens used: {tokens_used}")
+        
         return {
             'summary': result,
             'tokens_used': tokens_used
@@ -169,6 +260,70 @@ Be encouraging and specific.
     except Exception as e:
         logger.exception(f"Error calling OpenAI API: {e}")
         raise
-    
-    
-    
\ No newline at end of file
+
+
+async def astream_completion(request, result):
+    """
+    Async ``stream_completion``: yields text fragments as they arrive.
+
+    Async generators cannot return a value, so 'summary' and 'tokens_used'
+    are written into the ``result`` dict once the stream has finished.
+    """
+    try:
+        stream = await get_async_client().chat.completions.create(
+            **request,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        
+        parts = []
+        tokens_used = 0
+        async for chunk in stream:
+            if chunk.usage:
+                tokens_used = chunk.usage.total_tokens
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+                yield chunk.choices[0].delta.content
+        
+        logger.info(f"OpenAI analysis streamed. Tokens used: {tokens_used}")
+        
+        result['summary'] = ''.join(parts)
+        result['tokens_used'] = tokens_used
+        
+    except Exception as e:
+        logger.exception(f"Error streaming from OpenAI API: {e}")
+        raise
+
+
+class LocalCompletionBackend:
+    """
+    Stand-in for the OpenAI API that answers locally and deterministically.
+
+    Used to run the batch precomputation in tests and local development:
+    the "summary" echoes the model and the start of the prompt, and token
+    usage is estimated at four characters per token.
+
+    Usage:
+        backend = LocalCompletionBackend()
+        result = backend.complete(overall_performance_request(student_data))
+    """
+
+    def __init__(self, fail_times=0):
+        # Number of calls that raise first, to exercise retries
+        self.fail_times = fail_times
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def complete(self, request):
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+        if call <= self.fail_times:
+            raise RuntimeError(f"Simulated completion failure {call}")
+
+        prompt = request["messages"][-1]["content"].strip()
+        characters = sum(len(m["content"]) for m in request["messages"])
+        return {
+            'summary': f"[{request['model']}] {prompt[:200]}",
+            'tokens_used': characters // 4 + request.get("max_tokens", 0),
+        }
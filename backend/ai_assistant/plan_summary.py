@@ -0,0 +1,128 @@
+"""
+Individual plan text for the plan analysis prompt.
+
+A plan whose text fits AI_PLAN_PROMPT_TOKEN_BUDGET goes into the prompt as
+is. A longer one is split into chunks of about AI_PLAN_CHUNK_TOKENS on
+paragraph boundaries and each chunk is summarized; when the summaries are
+still over the budget they are chunked and summarized again. Every summary
+is stored on the plan keyed by the hash of its input, so repeated analyses
+make no completion calls and a re-uploaded plan only pays for the chunks
+that changed.
+
+Token counts are estimated at CHARS_PER_TOKEN characters per token.
+"""
+
+import hashlib
+import logging
+import re
+
+from django.conf import settings
+
+from user_management.plan_text import ensure_plan_text
+from .models import AIUsageLog
+from .openai_service import complete, plan_chunk_summary_request
+from .rate_limit import PLAN_SUMMARY_USAGE_TYPE
+
+logger = logging.getLogger(__name__)
+
+AI_PLAN_PROMPT_TOKEN_BUDGET = getattr(settings, 'AI_PLAN_PROMPT_TOKEN_BUDGET', 1500)
+AI_PLAN_CHUNK_TOKENS = getattr(settings, 'AI_PLAN_CHUNK_TOKENS', 2000)
+
+# Shortest summary asked for a chunk, however many chunks share the budget
+MIN_CHUNK_SUMMARY_TOKENS = 100
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def chunk_text(text, max_tokens=AI_PLAN_CHUNK_TOKENS):
+    """Split text into chunks of at most max_tokens, packing whole paragraphs where possible."""
+    limit = max_tokens * CHARS_PER_TOKEN
+
+    pieces = []
+    for paragraph in re.split(r'\n\s*\n', text):
+        paragraph = paragraph.strip()
+        # Paragraphs longer than a chunk are cut
+        pieces.extend(paragraph[i:i + limit] for i in range(0, len(paragraph), limit))
+
+    chunks = []
+    current = ''
+    for piece in pieces:
+        if current and len(current) + len(piece) + 2 > limit:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class _Summarizer:
+    """Summarizes chunks, reusing and collecting the summaries stored on a plan."""
+
+    def __init__(self, stored):
+        self.stored = stored
+        self.kept = {}
+        self.tokens_used = 0
+
+    def summarize(self, chunk, max_tokens):
+        key = f"{max_tokens}:{hashlib.sha256(chunk.encode('utf-8')).hexdigest()}"
+        summary = self.stored.get(key)
+        if summary is None:
+            result = complete(plan_chunk_summary_request(chunk, max_tokens))
+            summary = result['summary'].strip()
+            self.tokens_used += result['tokens_used']
+        self.kept[key] = summary
+        return summary
+
+    def fit(self, text, budget):
+        """text, or a summary of it within budget tokens"""
+        if estimate_tokens(text) <= budget:
+            return text
+
+        chunks = chunk_text(text)
+        per_chunk = max(MIN_CHUNK_SUMMARY_TOKENS, budget // len(chunks))
+        combined = '\n\n'.join(self.summarize(chunk, per_chunk) for chunk in chunks)
+
+        if len(chunks) == 1 or len(combined) >= len(text):
+            # Another pass would not shrink it; the completion's max_tokens bounds it, this bounds the estimate
+            return combined[:budget * CHARS_PER_TOKEN]
+        return self.fit(combined, budget)
+
+
+def plan_summary(plan, budget=AI_PLAN_PROMPT_TOKEN_BUDGET):
+    """
+    The plan's text condensed to at most ``budget`` tokens for the analysis prompt.
+
+    Blocking: may download the PDF from Drive and call OpenAI for chunks
+    without a stored summary. Returns '' if the PDF has no (readable) text;
+    callers then fall back to the placeholder.
+    """
+    text = ensure_plan_text(plan)
+    if not text:
+        return ''
+
+    summarizer = _Summarizer(plan.chunk_summaries or {})
+    summary = summarizer.fit(text, budget)
+
+    if summarizer.kept != plan.chunk_summaries:
+        # Drops summaries of chunks the current text no longer has
+        plan.chunk_summaries = summarizer.kept
+        plan.save(update_fields=['chunk_summaries'])
+
+    if summarizer.tokens_used:
+        # Accounted like every other OpenAI call, without using up the student's limit
+        AIUsageLog.objects.create(
+            student_email=plan.student_email,
+            analysis_type=PLAN_SUMMARY_USAGE_TYPE,
+            tokens_used=summarizer.tokens_used
+        )
+        logger.info(
+            f"Summarized plan of {plan.student_email}: {estimate_tokens(text)} -> "
+            f"{estimate_tokens(summary)} tokens ({summarizer.tokens_used} tokens used)"
+        )
+    return summary
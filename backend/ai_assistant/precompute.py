@@ -0,0 +1,121 @@
+"""
+Batch precomputation of overall AI summaries.
+
+``precompute_overall_summaries`` (run nightly by the
+``precompute_ai_summaries`` management command) generates the overall
+summary of every active student ahead of the Monday-morning peak. Results
+are stored in AIAnalysis with the same input hash and data fingerprint the
+view computes, so at peak time the view serves them from storage, before
+the rate limit and without Classroom calls, as long as the student's data
+has not changed since the batch ran.
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from appuser.models import CustomUser
+from .analysis_cache import request_hash, find_analysis, find_overall_analysis
+from .data_collector import collect_student_data, student_state_hash
+from .models import AIAnalysis, AIUsageLog
+from .openai_service import complete, overall_performance_request
+from .rate_limit import BATCH_USAGE_TYPE
+
+logger = logging.getLogger(__name__)
+
+PRECOMPUTE_CONCURRENCY = getattr(settings, 'AI_PRECOMPUTE_CONCURRENCY', 4)
+PRECOMPUTE_RETRIES = getattr(settings, 'AI_PRECOMPUTE_RETRIES', 3)
+RETRY_BACKOFF = 2
+
+
+def active_students():
+    """Users who get an overall summary: active, neither admin nor teacher."""
+    return CustomUser.objects.filter(is_active=True, is_admin=False, is_teacher=False)
+
+
+def precompute_summary(user, complete_fn=complete, retries=PRECOMPUTE_RETRIES, force=False):
+    """
+    Generate and store one student's overall summary, retrying failed completions.
+
+    The student's data is collected once; only the completion call is retried.
+
+    Returns:
+        str: 'generated', 'unchanged' (a stored summary matches the data) or 'failed'
+    """
+    try:
+        if not force and find_overall_analysis(user.email, student_state_hash(user)):
+            # Nothing changed locally since the last summary; no Classroom calls needed
+            return 'unchanged'
+
+        try:
+            openai_request = overall_performance_request(collect_student_data(user))
+        except Exception as e:
+            logger.error(f"Collecting data for the overall summary of {user.email} failed: {e}")
+            return 'failed'
+
+        input_hash = request_hash(openai_request)
+        if not force and find_analysis(user.email, 'overall', input_hash):
+            return 'unchanged'
+
+        for attempt in range(retries + 1):
+            try:
+                result = complete_fn(openai_request)
+                break
+            except Exception as e:
+                if attempt == retries:
+                    logger.error(f"Precomputing the overall summary of {user.email} failed: {e}")
+                    return 'failed'
+                delay = RETRY_BACKOFF ** attempt
+                logger.warning(
+                    f"Precomputing the overall summary of {user.email} failed "
+                    f"(attempt {attempt + 1}/{retries + 1}), retrying in {delay}s: {e}"
+                )
+                time.sleep(delay)
+
+        AIAnalysis.objects.create(
+            student_email=user.email,
+            analysis_type='overall',
+            input_hash=input_hash,
+            # Lets the view serve it before collecting anything or using the limit
+            data_fingerprint=student_state_hash(user) or '',
+            result=result['summary']
+        )
+        # Logged apart from the student's own analyses, so it doesn't use up their limit
+        AIUsageLog.objects.create(
+            student_email=user.email,
+            analysis_type=BATCH_USAGE_TYPE,
+            tokens_used=result['tokens_used']
+        )
+        return 'generated'
+    finally:
+        close_old_connections()
+
+
+def precompute_overall_summaries(complete_fn=complete, concurrency=PRECOMPUTE_CONCURRENCY,
+                                 retries=PRECOMPUTE_RETRIES, force=False, emails=None):
+    """
+    Precompute the overall summary of every active student.
+
+    Returns:
+        dict: Number of students per outcome ('generated', 'unchanged', 'failed')
+    """
+    students = active_students()
+    if emails:
+        students = students.filter(email__in=emails)
+    students = list(students)
+
+    stats = {'generated': 0, 'unchanged': 0, 'failed': 0}
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for outcome in executor.map(
+            lambda user: precompute_summary(user, complete_fn, retries, force), students
+        ):
+            stats[outcome] += 1
+
+    logger.info(
+        f"Precomputed overall summaries of {len(students)} students: {stats['generated']} generated, "
+        f"{stats['unchanged']} unchanged, {stats['failed']} failed"
+    )
+    return stats
@@ -0,0 +1,107 @@
+"""
+Per-student limit on AI analyses.
+
+``reserve_analysis`` checks the limit and takes a slot in one transaction
+that holds a row lock on the student's AIUsageCounter, so parallel
+requests cannot all pass the check. The slot is the AIUsageLog row the
+finished analysis records its tokens on; ``release_analysis`` gives it
+back when nothing was generated (cached result, error).
+
+AI_RATE_LIMIT_WINDOW_DAYS selects the window:
+    None (default)  calendar month; the counter row holds the month's count,
+                    so the check is a single-row read. A new row starts from
+                    the analyses already logged that month.
+    N               rolling N days, counted over the indexed
+                    (student_email, created_at) AIUsageLog rows
+"""
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import AIUsageCounter, AIUsageLog
+
+logger = logging.getLogger(__name__)
+
+AI_ANALYSIS_LIMIT = getattr(settings, 'AI_ANALYSIS_LIMIT', 10)
+
+# AIUsageLog type of analyses precomputed in batch; they don't use up the limit
+BATCH_USAGE_TYPE = 'overall_batch'
+# AIUsageLog type of plan chunk summaries, part of a plan analysis already counted
+PLAN_SUMMARY_USAGE_TYPE = 'plan_summary'
+UNCOUNTED_USAGE_TYPES = (BATCH_USAGE_TYPE, PLAN_SUMMARY_USAGE_TYPE)
+AI_RATE_LIMIT_WINDOW_DAYS = getattr(settings, 'AI_RATE_LIMIT_WINDOW_DAYS', None)
+
+if AI_RATE_LIMIT_WINDOW_DAYS:
+    LIMIT_MESSAGE = (
+        f"AI analysis limit reached ({AI_ANALYSIS_LIMIT} per {AI_RATE_LIMIT_WINDOW_DAYS} days). "
+        "Try again later."
+    )
+else:
+    LIMIT_MESSAGE = "Monthly AI analysis limit reached. Try again next month."
+
+
+def _month_start(now):
+    return now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _logged_since(email, start):
+    """Analyses logged for a student since start that count against the limit"""
+    return AIUsageLog.objects.filter(
+        student_email=email, created_at__gte=start
+    ).exclude(analysis_type__in=UNCOUNTED_USAGE_TYPES).count()
+
+
+def reserve_analysis(email, analysis_type):
+    """
+    Take one analysis slot for a student.
+
+    Returns:
+        AIUsageLog: The reserved usage row (tokens_used 0), or None if the
+        student has reached the limit
+    """
+    now = timezone.now()
+
+    with transaction.atomic():
+        counter, _ = AIUsageCounter.objects.get_or_create(
+            student_email=email,
+            # A student's first reservation since the counter was introduced
+            # starts from the analyses already logged this month
+            defaults={'window_start': _month_start(now), 'count': _logged_since(email, _month_start(now))}
+        )
+        # Serializes concurrent reservations of the same student
+        counter = AIUsageCounter.objects.select_for_update().get(pk=counter.pk)
+
+        if AI_RATE_LIMIT_WINDOW_DAYS:
+            used = _logged_since(email, now - timedelta(days=AI_RATE_LIMIT_WINDOW_DAYS))
+        else:
+            if counter.window_start < _month_start(now):
+                counter.window_start = _month_start(now)
+                counter.count = 0
+            used = counter.count
+
+        if used >= AI_ANALYSIS_LIMIT:
+            logger.info(f"AI analysis limit reached for {email} ({used}/{AI_ANALYSIS_LIMIT})")
+            return None
+
+        counter.count += 1
+        counter.save(update_fields=['window_start', 'count'])
+        return AIUsageLog.objects.create(student_email=email, analysis_type=analysis_type or '')
+
+
+def release_analysis(usage):
+    """Give back a slot taken by reserve_analysis that produced no completion."""
+    if usage is None:
+        return
+
+    with transaction.atomic():
+        AIUsageCounter.objects.filter(
+            student_email=usage.student_email,
+            window_start__lte=usage.created_at,
+            count__gt=0,
+        ).update(count=F('count') - 1)
+        usage.delete()
@@ -0,0 +1,106 @@
+"""
+Server-Sent Events helpers for streamed AI analyses.
+
+A streamed analysis sends ``token`` events ({"text": ...}) as the completion
+is generated, then one ``done`` event with the same body the non-streaming
+endpoint returns, or an ``error`` event ({"error": ...}) if it fails.
+"""
+
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+
+
+def sse_event(event, data):
+    """Encode one SSE message with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def token_events(completion):
+    """
+    Re-yield the text fragments of a streamed completion as ``token`` events.
+
+    Returns the completion's own return value, so callers can use
+    ``result = yield from token_events(...)``.
+    """
+    while True:
+        try:
+            text = next(completion)
+        except StopIteration as done:
+            return done.value
+        yield sse_event('token', {'text': text})
+
+
+def wants_stream(request, data):
+    """True if the client asked for an SSE response (``stream: true`` or Accept header)."""
+    return (
+        bool(data.get('stream'))
+        or 'text/event-stream' in request.META.get('HTTP_ACCEPT', '')
+    )
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets DRF views accept ``Accept: text/event-stream`` requests.
+
+    Streams are returned as StreamingHttpResponse and never pass through a
+    renderer; what does is a plain Response (errors, limits), sent as one
+    ``error`` event.
+    """
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return sse_event('error', data).encode('utf-8')
+
+
+async def iterate_in_thread(events):
+    """
+    Async iterator over a blocking one, each step run in a worker thread.
+
+    Django's ASGI handler buffers a sync iterator completely before sending
+    it; this keeps the blocking OpenAI stream and ORM calls off the event
+    loop while the messages still go out one by one.
+    """
+    def step():
+        try:
+            return True, next(events)
+        except StopIteration:
+            return False, None
+        finally:
+            # Steps land on arbitrary pool threads; don't leak their DB connections
+            close_old_connections()
+
+    try:
+        while True:
+            more, message = await sync_to_async(step, thread_sensitive=False)()
+            if not more:
+                return
+            yield message
+    finally:
+        # Client went away mid-stream: let the generator run its cleanup off the loop
+        if hasattr(events, 'close'):
+            await sync_to_async(events.close, thread_sensitive=False)()
+
+
+def event_stream_response(events, request=None):
+    """
+    Wrap an iterator of encoded SSE messages in an unbuffered streaming response.
+
+    Pass the request when ``events`` is a blocking iterator: served over
+    ASGI, it is driven through ``iterate_in_thread`` so it streams.
+    """
+    if isinstance(getattr(request, '_request', request), ASGIRequest) and not hasattr(events, '__aiter__'):
+        events = iterate_in_thread(iter(events))
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
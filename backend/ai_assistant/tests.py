@@ -1,3 +1,256 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import AsyncRequestFactory, TransactionTestCase, override_settings
+from rest_framework.test import APIRequestFactory
+
+from appuser.models import CustomUser
+from appuser.views import get_tokens_for_user
+from classroom import cache as classroom_cache
+from classroom_admin.models import DisplayedCourse
+from .analysis_cache import request_hash
+from .models import AIAnalysis, AIUsageCounter, AIUsageLog
+from .openai_service import LocalCompletionBackend, overall_performance_request
+from .precompute import precompute_overall_summaries
+from .rate_limit import AI_ANALYSIS_LIMIT, BATCH_USAGE_TYPE, reserve_analysis
+from .async_views import AsyncAIAssistantView
+from .data_collector import student_state_hash
+from .views import AIAssistantView
+
+STUDENT_EMAIL = 'student@example.com'
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+STUDENT_DATA = {
+    'name': 'Student',
+    'email': STUDENT_EMAIL,
+    'courses': [],
+    'plan_status': 'No individual plan yet',
+    'has_plan': False,
+}
+
+
+# Transactional: the precompute run stores results from worker threads
+@mock.patch('ai_assistant.precompute.time.sleep')
+@mock.patch('ai_assistant.precompute.collect_student_data', return_value=STUDENT_DATA)
+class PrecomputeOverallSummariesTests(TransactionTestCase):
+    """Nightly precomputation against LocalCompletionBackend"""
+
+    def setUp(self):
+        self.student = CustomUser.objects.create_user(email=STUDENT_EMAIL, first_name='Student')
+        CustomUser.objects.create_user(email='admin@example.com', is_admin=True)
+
+    def test_summary_is_generated_and_stored(self, collect, sleep):
+        backend = LocalCompletionBackend()
+
+        stats = precompute_overall_summaries(complete_fn=backend.complete, concurrency=2)
+
+        self.assertEqual(stats, {'generated': 1, 'unchanged': 0, 'failed': 0})
+        analysis = AIAnalysis.objects.get(student_email=STUDENT_EMAIL, analysis_type='overall')
+        self.assertEqual(analysis.input_hash, request_hash(overall_performance_request(STUDENT_DATA)))
+        self.assertTrue(analysis.data_fingerprint)
+        self.assertTrue(analysis.result.startswith('[gpt-4o-mini]'))
+
+        usage = AIUsageLog.objects.get(student_email=STUDENT_EMAIL)
+        self.assertEqual(usage.analysis_type, BATCH_USAGE_TYPE)
+        self.assertGreater(usage.tokens_used, 0)
+
+    def test_failed_completions_are_retried_without_recollecting(self, collect, sleep):
+        backend = LocalCompletionBackend(fail_times=2)
+
+        stats = precompute_overall_summaries(complete_fn=backend.complete, retries=3)
+
+        self.assertEqual(stats['generated'], 1)
+        self.assertEqual(backend.calls, 3)
+        self.assertEqual(collect.call_count, 1)
+        self.assertEqual(sleep.call_count, 2)
+
+    def test_student_fails_once_retries_are_used_up(self, collect, sleep):
+        backend = LocalCompletionBackend(fail_times=5)
+
+        stats = precompute_overall_summaries(complete_fn=backend.complete, retries=1)
+
+        self.assertEqual(stats['failed'], 1)
+        self.assertEqual(backend.calls, 2)
+        self.assertFalse(AIAnalysis.objects.exists())
+        self.assertFalse(AIUsageLog.objects.exists())
+
+    def test_unchanged_data_is_not_regenerated(self, collect, sleep):
+        backend = LocalCompletionBackend()
+        precompute_overall_summaries(complete_fn=backend.complete)
+
+        stats = precompute_overall_summaries(complete_fn=backend.complete)
+
+        self.assertEqual(stats['unchanged'], 1)
+        self.assertEqual(backend.calls, 1)
+        # The stored fingerprint matched: no second collection
+        self.assertEqual(collect.call_count, 1)
+
+    @mock.patch('ai_assistant.views.collect_student_data')
+    def test_view_serves_precomputed_summary_without_quota(self, view_collect, collect, sleep):
+        precompute_overall_summaries(complete_fn=LocalCompletionBackend().complete)
+        stored = AIAnalysis.objects.get(student_email=STUDENT_EMAIL)
+
+        token = get_tokens_for_user(self.student)['access']
+        request = APIRequestFactory().post(
+            '/api/ai/analyze/', {'type': 'overall'}, format='json', HTTP_AUTHORIZATION=f'Bearer {token}'
+        )
+        response = AIAssistantView.as_view()(request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'summary': stored.result, 'cached': True})
+        view_collect.assert_not_called()
+        self.assertFalse(AIUsageCounter.objects.exists())
+        self.assertFalse(AIUsageLog.objects.exclude(analysis_type=BATCH_USAGE_TYPE).exists())
+
+
+class AnalysisRequestTests(TransactionTestCase):
+    """Requests both views reject before reserving an analysis"""
+
+    def setUp(self):
+        self.student = CustomUser.objects.create_user(email=STUDENT_EMAIL)
+        self.token = get_tokens_for_user(self.student)['access']
+
+    def async_post(self, body, **headers):
+        request = AsyncRequestFactory().post('/api/ai-assistant/analyze/async/', body, content_type='application/json',
+                                             headers=headers)
+        return AsyncAIAssistantView.as_view()(request)
+
+    def test_non_object_body_is_rejected(self):
+        request = APIRequestFactory().post(
+            '/api/ai-assistant/analyze/', ['overall'], format='json', HTTP_AUTHORIZATION=f'Bearer {self.token}'
+        )
+        response = AIAssistantView.as_view()(request)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(AIUsageLog.objects.exists())
+
+    async def test_async_non_object_body_is_rejected(self):
+        response = await self.async_post('["overall"]', authorization=f'Bearer {self.token}')
+
+        self.assertEqual(response.status_code, 400)
+
+    async def test_async_missing_token_is_unauthorized(self):
+        response = await self.async_post('{"type": "overall"}')
+
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('WWW-Authenticate', response)
+
+
+def fake_stream(openai_request):
+    yield 'Hello'
+    yield ' there'
+    return {'summary': 'Hello there', 'tokens_used': 5}
+
+
+@mock.patch('ai_assistant.views.stream_completion', side_effect=fake_stream)
+@mock.patch('ai_assistant.views.collect_student_data', return_value=STUDENT_DATA)
+class StreamedAnalysisTests(TransactionTestCase):
+    """The reserved slot of a streamed analysis"""
+
+    def setUp(self):
+        self.student = CustomUser.objects.create_user(email=STUDENT_EMAIL)
+        token = get_tokens_for_user(self.student)['access']
+        request = APIRequestFactory().post(
+            '/api/ai-assistant/analyze/', {'type': 'overall', 'stream': True}, format='json',
+            HTTP_AUTHORIZATION=f'Bearer {token}'
+        )
+        self.response = AIAssistantView.as_view()(request)
+
+    def test_finished_stream_keeps_the_slot(self, collect, stream):
+        b''.join(self.response.streaming_content)
+
+        self.assertEqual(AIUsageCounter.objects.get().count, 1)
+        self.assertEqual(AIAnalysis.objects.get().result, 'Hello there')
+
+    def test_disconnect_releases_the_slot(self, collect, stream):
+        next(iter(self.response.streaming_content))
+        # What the server does when the client goes away mid-stream
+        self.response.close()
+
+        self.assertEqual(AIUsageCounter.objects.get().count, 0)
+        self.assertFalse(AIUsageLog.objects.exists())
+        self.assertFalse(AIAnalysis.objects.exists())
+
+
+class ReserveAnalysisTests(TransactionTestCase):
+    """reserve_analysis when the student has no counter row yet"""
+
+    def test_new_counter_starts_from_this_months_log(self):
+        AIUsageLog.objects.bulk_create(
+            [AIUsageLog(student_email=STUDENT_EMAIL, analysis_type='overall') for _ in range(AI_ANALYSIS_LIMIT)]
+        )
+        # Precomputed summaries don't use up the limit
+        AIUsageLog.objects.create(student_email=STUDENT_EMAIL, analysis_type=BATCH_USAGE_TYPE)
+
+        self.assertIsNone(reserve_analysis(STUDENT_EMAIL, 'overall'))
+        self.assertEqual(AIUsageCounter.objects.get().count, AI_ANALYSIS_LIMIT)
+
+    def test_batch_usage_is_not_counted(self):
+        AIUsageLog.objects.create(student_email=STUDENT_EMAIL, analysis_type=BATCH_USAGE_TYPE)
+
+        self.assertIsNotNone(reserve_analysis(STUDENT_EMAIL, 'overall'))
+        self.assertEqual(AIUsageCounter.objects.get().count, 1)
+
+
+class FakeBatch:
+    """GoogleBatch answering course c1 with one assignment and its returned submission"""
+
+    executions = 0
+    responses = {
+        'course': {'id': 'c1', 'name': 'Course'},
+        'coursework': {'courseWork': [{'id': 'w1', 'title': 'Work', 'updateTime': '2026-10-01T08:00:00Z'}]},
+        'submissions': {'studentSubmissions': [{'courseWorkId': 'w1', 'state': 'RETURNED', 'assignedGrade': 9}]},
+    }
+
+    def __init__(self, service):
+        self.keys = []
+        self.stats = {'batches': 1}
+
+    def add(self, key, request):
+        self.keys.append(key)
+
+    def execute(self):
+        FakeBatch.executions += 1
+        return {key: self.responses[key[1]] for key in self.keys}, {}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+@mock.patch('ai_assistant.data_collector.GoogleBatch', FakeBatch)
+@mock.patch('ai_assistant.data_collector.get_classroom_service')
+class NonMirroredCourseTests(TransactionTestCase):
+    """Precomputed summaries of students in courses the sync worker doesn't mirror"""
+
+    def setUp(self):
+        cache.clear()
+        FakeBatch.executions = 0
+        self.student = CustomUser.objects.create_user(email=STUDENT_EMAIL, first_name='Student')
+        DisplayedCourse.objects.create(course_id='c1', name='Course', alternate_link='https://classroom.google.com/c/c1')
+        precompute_overall_summaries(complete_fn=LocalCompletionBackend().complete)
+
+    def expire_classroom_cache(self):
+        parts = classroom_cache.course_parts('c1')
+        for resource in ('coursework', 'submissions'):
+            classroom_cache.invalidate(STUDENT_EMAIL, resource, *parts)
+
+    def test_summary_is_served_after_the_classroom_cache_expires(self, get_service):
+        stored = AIAnalysis.objects.get(student_email=STUDENT_EMAIL, analysis_type='overall')
+        self.assertTrue(stored.data_fingerprint)
+        self.expire_classroom_cache()
+
+        token = get_tokens_for_user(self.student)['access']
+        request = APIRequestFactory().post(
+            '/api/ai-assistant/analyze/', {'type': 'overall'}, format='json', HTTP_AUTHORIZATION=f'Bearer {token}'
+        )
+        response = AIAssistantView.as_view()(request)
+
+        self.assertEqual(response.data, {'summary': stored.result, 'cached': True})
+        self.assertEqual(FakeBatch.executions, 1)
+
+    def test_course_change_drops_the_remembered_state(self, get_service):
+        self.expire_classroom_cache()
+        self.assertIsNotNone(student_state_hash(self.student))
+
+        classroom_cache.invalidate_course('c1')
+
+        self.assertIsNone(student_state_hash(self.student))
@@ -1,6 +1,8 @@
 from django.urls import path
 from .views import AIAssistantView
+from .async_views import AsyncAIAssistantView
 
 urlpatterns = [
     path('analyze/', AIAssistantView.as_view(), name='ai-analyze'),
+    path('analyze/async/', AsyncAIAssistantView.as_view(), name='ai-analyze-async'),
 ]
\ No newline at end of file
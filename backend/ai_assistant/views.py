@@ -1,179 +1,285 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.settings import api_settings
 from appuser.permissions import IsLabAdminOrStudent
 from .models import AIAnalysis, AIUsageLog
-from .openai_service import analyze_overall_performance, analyze_course_performance, analyze_individual_plan
-from .data_collector import collect_student_data, collect_course_data
+from .openai_service import (
+    complete,
+    stream_completion,
+    overall_performance_request,
+    course_performance_request,
+    individual_plan_request,
+)
+from .analysis_cache import request_hash, find_analysis, find_course_analysis, find_overall_analysis
+from .rate_limit import LIMIT_MESSAGE, reserve_analysis, release_analysis
+from .streaming import sse_event, token_events, wants_stream, event_stream_response, EventStreamRenderer
+from .data_collector import collect_student_data, collect_course_data, course_state_hash, student_state_hash
+from .plan_summary import plan_summary
+from classroom_admin.models import DisplayedCourse
 from user_management.models import StudentIndividualPlan
-from datetime import datetime, timedelta
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-class AIAssistantView(APIView):
-    """Main AI assistant endpoint"""
-    
-    permission_classes = [IsLabAdminOrStudent]
+def get_student_plan(email):
+    return StudentIndividualPlan.objects.filter(student_email=email).first()
+
+
+def course_analysis_request(user, course_data):
+    """OpenAI request for course-specific insights from collected course data"""
+    student_data = {'name': user.first_name or user.email.split('@')[0]}
+    return course_performance_request(student_data, course_data)
+
+
+def get_plan_with_summary(email):
+    """The student's individual plan and its text condensed for the prompt, or (None, '')"""
+    plan = get_student_plan(email)
+    if not plan:
+        return None, ''
+    return plan, plan_summary(plan)
+
+
+def plan_analysis_request(student_data, plan, summary):
+    """OpenAI request for the individual plan analysis"""
+    plan_data = {
+        'summary': summary or 'Individual plan document available',
+        'uploaded_at': plan.uploaded_at
+    }
+    return individual_plan_request(student_data, plan_data)
+
+
+def stored_course_analysis(user, course_id):
+    """Stored course insight based on the course's current coursework and submissions, or None"""
+    return find_course_analysis(user.email, course_id, course_state_hash(user, course_id))
+
+
+def stored_analysis_payload(user, analysis_type, data):
+    """
+    Response body of a stored overall or course analysis of unchanged data, or None.
     
-    def post(self, request):
-        user = request.user
-        analysis_type = request.data.get('type')  # 'overall', 'course', 'plan'
-        
-        # Check rate limit (max 10 requests per month)
-        if not self.check_rate_limit(user.email):
-            return Response(
-                {"error": "Monthly AI analysis limit reached. Try again next month."},
-                status=status.HTTP_429_TOO_MANY_REQUESTS
-            )
-        
-        try:
-            if analysis_type == 'overall':
-                return self.get_overall_summary(user)
-            elif analysis_type == 'course':
-                course_id = request.data.get('course_id')
-                if not course_id:
-                    return Response(
-                        {"error": "course_id required"},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                return self.get_course_insights(user, course_id)
-            elif analysis_type == 'plan':
-                return self.analyze_plan(user)
-            else:
-                return Response(
-                    {"error": "Invalid analysis type"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-                
-        except Exception as e:
-            logger.exception(f"Error in AI analysis for {user.email}")
-            return Response(
-                {"error": str(e)},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+    Looked up before the rate limit and from local data only, so a hit
+    (e.g. a precomputed overall summary) costs no quota and no Classroom calls.
+    """
+    if analysis_type == 'overall':
+        stored = find_overall_analysis(user.email, student_state_hash(user))
+        return {'summary': stored.result, 'cached': True} if stored else None
     
-    def check_rate_limit(self, email):
-        """Check if user has exceeded monthly limit"""
-        now = datetime.now()
-        count = AIUsageLog.objects.filter(
-            student_email=email,
-            created_at__year=now.year,
-            created_at__month=now.month
-        ).count()
-
-        return count < 10  # Max 10 per month
+    course_id = data.get('course_id')
+    if analysis_type == 'course' and course_id:
+        stored = stored_course_analysis(user, course_id)
+        if stored:
+            return {'summary': stored.result, 'cached': True, 'course_name': course_name(course_id)}
+    return None
+
+
+def course_name(course_id):
+    """Display name of a course from local data"""
+    course = DisplayedCourse.objects.filter(course_id=course_id).values_list('name', flat=True).first()
+    return course or ''
+
+
+def save_analysis(user, analysis_type, result, input_hash, course_id=None, usage=None, fingerprint=''):
+    """Store a finished analysis and log its token usage (on the reserved usage row, if any)"""
+    AIAnalysis.objects.create(
+        student_email=user.email,
+        analysis_type=analysis_type,
+        course_id=course_id,
+        input_hash=input_hash,
+        data_fingerprint=fingerprint or '',
+        result=result['summary']
+    )
     
-    def get_overall_summary(self, user):
-        """Generate overall performance summary"""
-        
-        # Check for recent cached analysis (within last hour)
-        recent_analysis = AIAnalysis.objects.filter(
-            student_email=user.email,
-            analysis_type='overall',
-            created_at__gte=datetime.now() - timedelta(hours=1)
-        ).first()
-        
-        if recent_analysis:
-            return Response({
-                'summary': recent_analysis.result,
-                'cached': True
-            })
-        
-        # Collect student data
-        student_data = collect_student_data(user)
-        
-        # Call OpenAI
-        result = analyze_overall_performance(student_data)
-        
-        # Save analysis
-        AIAnalysis.objects.create(
-            student_email=user.email,
-            analysis_type='overall',
-            result=result['summary']
-        )
-        
-        # Log usage
+    if usage is not None:
+        usage.tokens_used = result['tokens_used']
+        usage.save(update_fields=['tokens_used'])
+    else:
         AIUsageLog.objects.create(
             student_email=user.email,
-            analysis_type='overall',
+            analysis_type=analysis_type,
             tokens_used=result['tokens_used']
         )
-        
-        return Response({
-            'summary': result['summary'],
-            'cached': False
-        })
+
+
+class AnalysisError(Exception):
+    """A request that cannot be analyzed, answered with {"error": message} and status"""
+
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class Analysis:
+    """
+    One analysis request, from the stored lookup to the saved result.
+    
+    Shared by AIAssistantView and AsyncAIAssistantView so both apply the
+    same rules; the views only choose how to wait (the async view runs
+    these blocking methods in worker threads) and how to respond. Order:
+    stored_payload, reserve, prepare, cached_payload, then finish with the
+    completion or release if none was generated.
+    """
+    
+    def __init__(self, user, data):
+        self.user = user
+        self.data = data
+        self.analysis_type = data.get('type')  # 'overall', 'course', 'plan'
+        self.usage = None
+        self.openai_request = None
+        self.input_hash = None
+        self.course_id = None
+        self.extra = {}
+        self.fingerprint = ''
+    
+    def stored_payload(self):
+        """Stored analysis of unchanged data, checked before the rate limit (see stored_analysis_payload)"""
+        return stored_analysis_payload(self.user, self.analysis_type, self.data)
+    
+    def reserve(self):
+        """Atomically take one analysis from the student's limit; False if it is used up"""
+        self.usage = reserve_analysis(self.user.email, self.analysis_type)
+        return self.usage is not None
+    
+    def release(self):
+        """Give the reserved slot back; nothing was generated"""
+        release_analysis(self.usage)
+        self.usage = None
     
-    def get_course_insights(self, user, course_id):
-        """Generate course-specific insights"""
+    def prepare(self):
+        """Collect the data and build the OpenAI request. Raises AnalysisError for invalid requests."""
+        user = self.user
         
-        # Collect data
-        student_data = {'name': user.first_name or user.email.split('@')[0]}
-        course_data = collect_course_data(user, course_id)
+        if self.analysis_type == 'overall':
+            student_data = collect_student_data(user)
+            self.openai_request = overall_performance_request(student_data)
+            self.fingerprint = student_state_hash(user)
         
-        # Call OpenAI
-        result = analyze_course_performance(student_data, course_data)
+        elif self.analysis_type == 'course':
+            self.course_id = self.data.get('course_id')
+            if not self.course_id:
+                raise AnalysisError("course_id required", status.HTTP_400_BAD_REQUEST)
+            # A stored insight of unchanged data was already served by stored_payload
+            course_data = collect_course_data(user, self.course_id)
+            self.openai_request = course_analysis_request(user, course_data)
+            self.extra['course_name'] = course_data['name']
+            self.fingerprint = course_state_hash(user, self.course_id)
         
-        # Save analysis
-        AIAnalysis.objects.create(
-            student_email=user.email,
-            analysis_type='course',
-            course_id=course_id,
-            result=result['summary']
-        )
+        elif self.analysis_type == 'plan':
+            # Its text is extracted and summarized once, then reused
+            plan, summary = get_plan_with_summary(user.email)
+            if not plan:
+                raise AnalysisError("No individual plan found", status.HTTP_404_NOT_FOUND)
+            student_data = collect_student_data(user)
+            self.openai_request = plan_analysis_request(student_data, plan, summary)
         
-        # Log usage
-        AIUsageLog.objects.create(
-            student_email=user.email,
-            analysis_type='course',
-            tokens_used=result['tokens_used']
-        )
+        else:
+            raise AnalysisError("Invalid analysis type", status.HTTP_400_BAD_REQUEST)
         
-        return Response({
-            'summary': result['summary'],
-            'course_name': course_data['name']
-        })
+        self.input_hash = request_hash(self.openai_request)
     
-    def analyze_plan(self, user):
-        """Analyze individual plan"""
+    def cached_payload(self):
+        """
+        Response body of a stored analysis generated from the identical request, or None.
         
-        # Check if plan exists
-        plan = StudentIndividualPlan.objects.filter(
-            student_email=user.email
-        ).first()
+        Served without calling OpenAI, so it doesn't count against the limit.
+        """
+        stored = find_analysis(self.user.email, self.analysis_type, self.input_hash, self.course_id)
+        if not stored:
+            return None
+        self.release()
+        return {'summary': stored.result, 'cached': True, **self.extra}
+    
+    def finish(self, result):
+        """Save a finished completion and return the response body"""
+        save_analysis(
+            self.user, self.analysis_type, result, self.input_hash, self.course_id, self.usage, self.fingerprint
+        )
+        return {'summary': result['summary'], **self.extra, 'cached': False}
+
+
+def stored_response(payload, stream):
+    """Answer with a stored analysis, as JSON or as a single SSE 'done' event"""
+    if stream:
+        return event_stream_response(iter([sse_event('done', payload)]))
+    return Response(payload)
+
+
+class AIAssistantView(APIView):
+    """Main AI assistant endpoint"""
+    
+    permission_classes = [IsLabAdminOrStudent]
+    # Content negotiation must accept SSE clients (Accept: text/event-stream)
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, EventStreamRenderer]
+    
+    def post(self, request):
+        if not isinstance(request.data, dict):
+            return Response(
+                {"error": "Request body must be a JSON object"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        analysis = Analysis(request.user, request.data)
+        stream = wants_stream(request, request.data)
+        
+        stored = analysis.stored_payload()
+        if stored is not None:
+            return stored_response(stored, stream)
         
-        if not plan:
+        if not analysis.reserve():
             return Response(
-                {"error": "No individual plan found"},
-                status=status.HTTP_404_NOT_FOUND
+                {"error": LIMIT_MESSAGE},
+                status=status.HTTP_429_TOO_MANY_REQUESTS
             )
         
-        # Collect data
-        student_data = collect_student_data(user)
-        plan_data = {
-            'summary': 'Individual plan document available',
-            'uploaded_at': plan.uploaded_at
-        }
+        try:
+            response = self.run_analysis(analysis, stream)
+        except AnalysisError as e:
+            response = Response({"error": str(e)}, status=e.status_code)
+        except Exception as e:
+            logger.exception(f"Error in AI analysis for {request.user.email}")
+            response = Response(
+                {"error": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
         
-        # Call OpenAI
-        result = analyze_individual_plan(student_data, plan_data)
+        if response.status_code >= 400:
+            # Nothing was generated; give the slot back
+            analysis.release()
+        return response
+    
+    def run_analysis(self, analysis, stream):
+        """
+        Call OpenAI and return the analysis, as JSON or streamed over SSE.
         
-        # Save analysis
-        AIAnalysis.objects.create(
-            student_email=user.email,
-            analysis_type='plan',
-            result=result['summary']
-        )
+        A stored analysis generated from the identical request is returned
+        as is ('cached': True). Otherwise the final text is saved to
+        AIAnalysis and the tokens used are logged to AIUsageLog once the
+        completion has finished.
+        """
+        analysis.prepare()
         
-        # Log usage
-        AIUsageLog.objects.create(
-            student_email=user.email,
-            analysis_type='plan',
-            tokens_used=result['tokens_used']
-        )
+        cached = analysis.cached_payload()
+        if cached:
+            return stored_response(cached, stream)
+        
+        if not stream:
+            return Response(analysis.finish(complete(analysis.openai_request)))
+        
+        def events():
+            saved = False
+            try:
+                result = yield from token_events(stream_completion(analysis.openai_request))
+                payload = analysis.finish(result)
+                saved = True
+                yield sse_event('done', payload)
+            except Exception as e:
+                logger.exception(f"Error in streamed AI analysis for {analysis.user.email}")
+                yield sse_event('error', {'error': str(e)})
+            finally:
+                # Also reached when the client disconnects mid-stream (GeneratorExit)
+                if not saved:
+                    analysis.release()
         
-        return Response({
-            'summary': result['summary']
-        })
\ No newline at end of file
+        # Under ASGI (uvicorn) the request lets the blocking stream be sent incrementally
+        return event_stream_response(events(), self.request)
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class AppuserConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'appuser'
+
+    def ready(self):
+        from django.db.models.signals import post_save
+        from appuser.authentication import user_saved
+        from appuser.models import CustomUser
+
+        # Deactivation revokes tokens and clears the cached user status
+        post_save.connect(user_saved, sender=CustomUser, dispatch_uid='appuser_user_saved')
@@ -0,0 +1,219 @@
+"""
+JWT authentication for the lab API.
+
+``LabJWTAuthentication`` behaves like simplejwt's ``JWTAuthentication``
+unless ``JWT_STATELESS_USER`` is enabled. In that mode the user is built
+from the verified token claims (``email``, ``first_name``, ``is_admin``,
+``is_teacher``, see ``get_tokens_for_user``) instead of being loaded from the database on
+every request. Whether the user is still active is looked up once per
+``JWT_USER_STATUS_CACHE_TTL`` seconds and kept in the Django cache.
+
+Tokens issued before ``revoke_user_tokens`` was called are rejected in
+both modes. That happens when a user is deactivated and when their group
+membership (and so the role claims in their tokens) changes.
+
+Authentication runs once per request: the outcome is memoized on the
+underlying HttpRequest and reused by DRF's ``request.user`` and every
+``appuser.permissions`` class. When DRF authenticated with plain simplejwt
+``JWTAuthentication``, its decoded token is reused and only the revocation
+(and stateless user) checks are run on it. With DEBUG on, ``UserAuthenticationMiddleware``
+reports how many times the token was actually decoded in the
+``X-JWT-Decode-Count`` response header.
+"""
+
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+from appuser.models import CustomUser
+
+logger = logging.getLogger(__name__)
+
+# Opt-in: resolve request.user from token claims instead of a CustomUser query
+JWT_STATELESS_USER = getattr(settings, 'JWT_STATELESS_USER', False)
+
+# How long a user's active/revoked status is trusted in stateless mode
+JWT_USER_STATUS_CACHE_TTL = getattr(settings, 'JWT_USER_STATUS_CACHE_TTL', 60)
+
+# Claims a token must carry to be resolved without the database
+REQUIRED_CLAIMS = ('email', 'first_name', 'is_admin', 'is_teacher')
+
+# Attributes set on the HttpRequest by LabJWTAuthentication.authenticate
+AUTH_RESULT_ATTR = '_lab_jwt_auth'
+DECODE_COUNT_ATTR = '_lab_jwt_decode_count'
+
+
+def _status_cache_key(user_id):
+    return f"jwt_user_status:{user_id}"
+
+
+def _revoked_cache_key(user_id):
+    return f"jwt_user_revoked:{user_id}"
+
+
+def invalidate_user_status(user_id):
+    """Forget the cached active status of a user (call after changing is_active)."""
+    cache.delete(_status_cache_key(user_id))
+
+
+def revoke_user_tokens(user_id):
+    """
+    Reject every token issued to a user before now.
+
+    The marker lives as long as a refresh token does, so only tokens that
+    could still be valid are affected.
+    """
+    lifetime = max(api_settings.ACCESS_TOKEN_LIFETIME, api_settings.REFRESH_TOKEN_LIFETIME)
+    cache.set(_revoked_cache_key(user_id), int(time.time()), timeout=int(lifetime.total_seconds()))
+    invalidate_user_status(user_id)
+
+
+def revoke_tokens_for_email(email):
+    """revoke_user_tokens for the user with this email, if they have logged in before."""
+    user_ids = CustomUser.objects.filter(email__iexact=(email or '').strip()).values_list(
+        api_settings.USER_ID_FIELD, flat=True
+    )
+    for user_id in user_ids:
+        revoke_user_tokens(user_id)
+
+
+def user_saved(sender, instance, **kwargs):
+    """
+    post_save handler for CustomUser (connected in AppuserConfig.ready).
+
+    Deactivating a user revokes their tokens; any save drops their cached
+    status. ``QuerySet.update`` sends no signal, so call the helpers directly
+    after bulk changes.
+    """
+    user_id = getattr(instance, api_settings.USER_ID_FIELD)
+    if instance.is_active:
+        invalidate_user_status(user_id)
+    else:
+        revoke_user_tokens(user_id)
+
+
+def _issued_before(token, revoked_at):
+    return revoked_at is not None and token.get('iat', 0) <= revoked_at
+
+
+def is_token_revoked(token):
+    """True if the token was issued before its user's tokens were revoked."""
+    user_id = token.get(api_settings.USER_ID_CLAIM)
+    return _issued_before(token, cache.get(_revoked_cache_key(user_id)))
+
+
+def _is_active(user_id, cached):
+    if cached is not None:
+        return cached
+
+    is_active = CustomUser.objects.filter(
+        **{api_settings.USER_ID_FIELD: user_id}, is_active=True
+    ).exists()
+    cache.set(_status_cache_key(user_id), is_active, timeout=JWT_USER_STATUS_CACHE_TTL)
+    return is_active
+
+
+def _drf_authentication(request):
+    """
+    A JWT authentication DRF already performed for this request, as (user, token), or None.
+
+    Reads the Request's private state directly: going through
+    ``request.user`` here would re-enter authentication. Only plain
+    simplejwt results are returned; LabJWTAuthentication memoizes its own.
+    """
+    state = getattr(request, '__dict__', {})
+    authenticator = state.get('_authenticator')
+    if (
+        isinstance(authenticator, JWTAuthentication)
+        and not isinstance(authenticator, LabJWTAuthentication)
+        and state.get('_user') is not None
+        and state.get('_auth') is not None
+    ):
+        return (state['_user'], state['_auth'])
+    return None
+
+
+def user_from_claims(validated_token):
+    """
+    Build an unsaved CustomUser from verified token claims.
+
+    The instance carries the primary key, so it can be used in queries and
+    foreign keys, but fields that are not in the token keep their defaults.
+    """
+    user = CustomUser(
+        **{api_settings.USER_ID_FIELD: validated_token[api_settings.USER_ID_CLAIM]},
+        email=validated_token['email'],
+        first_name=validated_token['first_name'],
+        is_admin=bool(validated_token['is_admin']),
+        is_teacher=bool(validated_token['is_teacher']),
+        is_staff=bool(validated_token['is_admin']),
+        is_active=True,
+    )
+    user._state.adding = False
+    return user
+
+
+class LabJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication with per-request memoization and the optional stateless user mode."""
+
+    def authenticate(self, request):
+        http_request = getattr(request, '_request', request)
+
+        result = getattr(http_request, AUTH_RESULT_ATTR, None)
+        if result is None:
+            # Either DRF's own JWTAuthentication decoded the token already, or we do it now
+            setattr(http_request, DECODE_COUNT_ATTR, getattr(http_request, DECODE_COUNT_ATTR, 0) + 1)
+            drf_result = _drf_authentication(request)
+            try:
+                if drf_result is not None:
+                    result = self.check_drf_result(*drf_result)
+                else:
+                    result = super().authenticate(request) or ()
+            except AuthenticationFailed as e:
+                result = e
+        setattr(http_request, AUTH_RESULT_ATTR, result)
+
+        if isinstance(result, AuthenticationFailed):
+            raise result
+        return result or None
+
+    def check_drf_result(self, user, validated_token):
+        """
+        Apply this class's checks to a token plain JWTAuthentication accepted.
+
+        simplejwt already loaded the user and checked ``is_active``; what it
+        does not know about is revocation and the stateless user.
+        """
+        if JWT_STATELESS_USER:
+            return (self.get_user(validated_token), validated_token)
+        if is_token_revoked(validated_token):
+            raise AuthenticationFailed("Token has been revoked", code="token_revoked")
+        return (user, validated_token)
+
+    def get_user(self, validated_token):
+        if not JWT_STATELESS_USER or any(claim not in validated_token for claim in REQUIRED_CLAIMS):
+            if is_token_revoked(validated_token):
+                raise AuthenticationFailed("Token has been revoked", code="token_revoked")
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise AuthenticationFailed("Token contained no recognizable user identification")
+
+        # One cache round trip for both checks
+        cached = cache.get_many([_status_cache_key(user_id), _revoked_cache_key(user_id)])
+
+        if _issued_before(validated_token, cached.get(_revoked_cache_key(user_id))):
+            logger.warning(f"Rejected revoked token for user {user_id}")
+            raise AuthenticationFailed("Token has been revoked", code="token_revoked")
+
+        if not _is_active(user_id, cached.get(_status_cache_key(user_id))):
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+
+        return user_from_claims(validated_token)
@@ -2,28 +2,16 @@ import os
 import base64
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from googleapiclient.discovery import build
-from google.oauth2 import service_account
+from classroom.google_service import get_google_service
 
 def get_gmail_service(user_email: str):
     """
     Create Gmail API service with domain-wide delegation.
     """
-    SERVICE_ACCOUNT_FILE = os.path.join(
-        os.path.dirname(__file__), 
-        'service_account.json'
-    )
-    
     SCOPES = ['https://www.googleapis.com/auth/gmail.send']
-    
-    credentials = service_account.Credentials.from_service_account_file(
-        SERVICE_ACCOUNT_FILE,
-        scopes=SCOPES,
-        subject=user_email  # Impersonate this user
-    )
-    
-    service = build('gmail', 'v1', credentials=credentials)
-    return service
+
+    # Pooled service; the access token is shared across workers
+    return get_google_service('gmail', 'v1', user_email, SCOPES)
 
 
 def send_contact_form_email(name: str, email: str, subject: str, message: str):
@@ -0,0 +1,96 @@
+"""
+Caching transport for verifying Google ID tokens.
+
+``id_token.verify_oauth2_token`` downloads Google's signing certificates
+through the transport it is given. ``CachingRequest`` keeps GET responses
+for as long as their Cache-Control max-age allows and sends everything
+through one pooled ``requests.Session``, so a login normally verifies the
+token signature without any network call. ``start_prefetch`` warms the
+cache when a server worker starts (see backend/asgi.py and wsgi.py).
+"""
+
+import logging
+import re
+import threading
+import time
+
+import requests as http_requests
+from django.conf import settings
+from google.auth import transport
+from google.auth.transport import requests as google_requests
+from google.oauth2 import id_token
+
+logger = logging.getLogger(__name__)
+
+# Where verify_oauth2_token fetches its certificates from
+GOOGLE_OAUTH2_CERTS_URL = id_token._GOOGLE_OAUTH2_CERTS_URL
+
+_MAX_AGE_RE = re.compile(r'max-age=(\d+)')
+
+
+def _max_age(cache_control):
+    """Seconds a response may be reused for, from its Cache-Control header."""
+    if not cache_control or 'no-store' in cache_control or 'no-cache' in cache_control:
+        return 0
+    match = _MAX_AGE_RE.search(cache_control)
+    return int(match.group(1)) if match else 0
+
+
+class CachingRequest(transport.Request):
+    """google.auth transport that caches GET responses per Cache-Control max-age."""
+
+    def __init__(self, session=None):
+        self._transport = google_requests.Request(session=session or http_requests.Session())
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, url, method='GET', body=None, headers=None, **kwargs):
+        if method != 'GET' or body is not None:
+            return self._transport(url, method=method, body=body, headers=headers, **kwargs)
+
+        entry = self._cache.get(url)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+
+        response = self._transport(url, method=method, headers=headers, **kwargs)
+        if response.status == 200:
+            max_age = _max_age(response.headers.get('cache-control'))
+            if max_age:
+                # Read the body now so the cached response can be replayed
+                _ = response.data
+                with self._lock:
+                    self._cache[url] = (time.monotonic() + max_age, response)
+        return response
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+# Shared by every login on this worker
+certs_request = CachingRequest()
+
+
+def verify_google_id_token(token, audience):
+    """verify_oauth2_token over the shared caching transport."""
+    return id_token.verify_oauth2_token(token, certs_request, audience)
+
+
+def prefetch_certs():
+    """Load Google's signing certificates into the cache; failures are only logged."""
+    try:
+        response = certs_request(GOOGLE_OAUTH2_CERTS_URL)
+        logger.debug(f"Prefetched Google certificates (HTTP {response.status})")
+    except Exception as e:
+        logger.warning(f"Could not prefetch Google certificates: {e}")
+
+
+def start_prefetch():
+    """
+    Prefetch in a background thread, unless settings.GOOGLE_CERTS_PREFETCH is False.
+
+    Called by the server entry points only, so manage.py commands and test
+    runs make no request.
+    """
+    if getattr(settings, 'GOOGLE_CERTS_PREFETCH', True):
+        threading.Thread(target=prefetch_certs, daemon=True).start()
@@ -1,14 +1,12 @@
 import os
 from django.conf import settings
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
 from googleapiclient.http import MediaFileUpload
 from googleapiclient.errors import HttpError
+from classroom.google_service import get_google_service
 import logging
 
 logger = logging.getLogger(__name__)
 
-SERVICE_ACCOUNT_FILE = 'appuser/service_account.json'
 SCOPES = [
     'https://www.googleapis.com/auth/drive.file',
     'https://www.googleapis.com/auth/drive',
@@ -24,12 +22,8 @@ def get_service_account_drive_service():
     triggers an upload — the central Drive of the designated admin account.
     """
     admin_email = settings.GOOGLE_ADMIN_EMAIL
-    creds = service_account.Credentials.from_service_account_file(
-        SERVICE_ACCOUNT_FILE,
-        scopes=SCOPES,
-        subject=admin_email,  # Fixed owner — not the uploading user.
-    )
-    return build('drive', 'v3', credentials=creds)
+    # Fixed owner — not the uploading user.
+    return get_google_service('drive', 'v3', admin_email, SCOPES)
 
 
 def get_drive_service(user_email):
@@ -38,12 +32,7 @@ def get_drive_service(user_email):
     Prefer get_service_account_drive_service() for file storage so that the
     folder structure lives in one place regardless of who triggers the upload.
     """
-    creds = service_account.Credentials.from_service_account_file(
-        SERVICE_ACCOUNT_FILE,
-        scopes=SCOPES,
-        subject=user_email,
-    )
-    return build('drive', 'v3', credentials=creds)
+    return get_google_service('drive', 'v3', user_email, SCOPES)
 
 
 def get_or_create_folder(service, folder_name, parent_id=None):
@@ -1,28 +1,42 @@
 import os
 import logging
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
+from django.conf import settings
+from django.core.cache import cache
 from dotenv import load_dotenv
+from classroom.google_service import get_google_service
+from classroom.parallel import run_parallel
+from user_management.group_snapshot import snapshot_roles
 load_dotenv()
 
 
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-SERVICE_ACCOUNT_FILE = os.path.join(BASE_DIR, 'appuser', 'service_account.json')
 ADMIN_EMAIL = os.getenv('GOOGLE_ADMIN_EMAIL')
 ADMIN_GROUP = os.getenv('GOOGLE_ADMIN_GROUP')
 STUDENTS_GROUP = os.getenv('GOOGLE_STUDENTS_GROUP')
 TEACHERS_GROUP = os.getenv('GOOGLE_TEACHERS_GROUP')
 logger = logging.getLogger(__name__)
 
+DIRECTORY_READONLY_SCOPES = ['https://www.googleapis.com/auth/admin.directory.group.readonly']
+
+# How long a user's group membership is trusted before asking Google again.
+GROUP_MEMBERSHIP_CACHE_TTL = getattr(settings, 'GROUP_MEMBERSHIP_CACHE_TTL', 300)
+
 
 def _get_directory_service():
-    """Helper function to create Google Directory service."""
-    SCOPES = ['https://www.googleapis.com/auth/admin.directory.group.readonly']
-    creds = service_account.Credentials.from_service_account_file(
-        SERVICE_ACCOUNT_FILE, scopes=SCOPES
-    ).with_subject(ADMIN_EMAIL)
-    
-    return build('admin', 'directory_v1', credentials=creds)
+    """Helper function to return the shared, pooled Google Directory service."""
+    return get_google_service('admin', 'directory_v1', ADMIN_EMAIL, DIRECTORY_READONLY_SCOPES)
+
+
+def _membership_cache_key(user_email):
+    return f"group_membership:{user_email.strip().lower()}"
+
+
+def _has_member(service, user_email, group_email):
+    """Ask the Directory API whether user_email is in group_email (raises on API errors)."""
+    result = service.members().hasMember(
+        groupKey=group_email,
+        memberKey=user_email
+    ).execute()
+    return result.get('isMember', False)
 
 
 def is_user_in_group(user_email, group_email):
@@ -35,30 +49,73 @@ def is_user_in_group(user_email, group_email):
     """
     service = _get_directory_service()
     try:
-        result = service.members().hasMember(
-            groupKey=group_email,
-            memberKey=user_email
-        ).execute()
-        return result.get('isMember', False)
+        return _has_member(service, user_email, group_email)
     except Exception as e:
         logger.error(f"Error checking group membership for {user_email} in {group_email}: {e}")
         return False
-    
-    
+
+
 def check_user_groups(user_email):
     """Check which groups a user belongs to.
+
+    Roles come from the local group snapshot when it knows the user;
+    otherwise the membership checks run concurrently over one shared
+    Directory client. Complete results are cached per email for
+    GROUP_MEMBERSHIP_CACHE_TTL seconds (see invalidate_user_groups).
     Args:
         user_email (str): User's email address.
     Returns:
         dict: Dictionary with 'is_admin', 'is_student', and 'is_authorized' keys.
     """
-    is_admin = is_user_in_group(user_email, ADMIN_GROUP)
-    is_student = is_user_in_group(user_email, STUDENTS_GROUP)
-    is_teacher = is_user_in_group(user_email, TEACHERS_GROUP) if TEACHERS_GROUP else False
+    cache_key = _membership_cache_key(user_email)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    # One indexed read against the synced group snapshot; live API on a miss
+    snapshot = snapshot_roles(user_email)
+    if snapshot is not None:
+        cache.set(cache_key, snapshot, timeout=GROUP_MEMBERSHIP_CACHE_TTL)
+        return snapshot
 
-    return {
+    service = _get_directory_service()
+    groups = {'is_admin': ADMIN_GROUP, 'is_student': STUDENTS_GROUP}
+    if TEACHERS_GROUP:
+        groups['is_teacher'] = TEACHERS_GROUP
+
+    errors = []
+
+    def check(group_email):
+        def task():
+            try:
+                return _has_member(service, user_email, group_email)
+            except Exception as e:
+                logger.error(f"Error checking group membership for {user_email} in {group_email}: {e}")
+                errors.append(group_email)
+                return False
+        return task
+
+    results = run_parallel({flag: check(group) for flag, group in groups.items()})
+
+    is_admin = results['is_admin']
+    is_student = results['is_student']
+    is_teacher = results.get('is_teacher', False)
+
+    group_info = {
         'is_admin': is_admin,
         'is_student': is_student,
         'is_teacher': is_teacher,
         'is_authorized': is_admin or is_student or is_teacher
-    }
\ No newline at end of file
+    }
+
+    # Don't remember answers that were degraded by API errors
+    if not errors:
+        cache.set(cache_key, group_info, timeout=GROUP_MEMBERSHIP_CACHE_TTL)
+
+    return group_info
+
+
+def invalidate_user_groups(user_email):
+    """Forget the cached group membership of a user (call after changing membership)."""
+    if user_email:
+        cache.delete(_membership_cache_key(user_email))
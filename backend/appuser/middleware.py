@@ -1,11 +1,24 @@
 import logging
+from django.conf import settings
 from django.http import JsonResponse
+from appuser.authentication import DECODE_COUNT_ATTR
 from appuser.models import CustomUser
 logger = logging.getLogger(__name__)
 class UserAuthenticationMiddleware:
     """
     Optional middleware to log authentication attempts and
     provide additional security checks.
+
+    Not active unless listed in settings.MIDDLEWARE (settings.py is not
+    tracked; add it per deployment):
+
+        MIDDLEWARE = [
+            ...
+            'appuser.middleware.UserAuthenticationMiddleware',
+        ]
+
+    With DEBUG on it also adds an X-JWT-Decode-Count header, the number
+    of times the request's JWT was decoded (1 once authentication runs).
     """
     
     def __init__(self, get_response):
@@ -18,4 +31,9 @@ class UserAuthenticationMiddleware:
                 logger.info(f"API request to {request.path} by {user_email}")
         
         response = self.get_response(request)
+
+        # Lets tests and developers check the token was decoded only once
+        if settings.DEBUG and hasattr(request, DECODE_COUNT_ATTR):
+            response['X-JWT-Decode-Count'] = str(getattr(request, DECODE_COUNT_ATTR))
+
         return response
\ No newline at end of file
@@ -2,11 +2,14 @@
 Custom permission classes for Django REST Framework with JWT authentication.
 
 These permission classes use JWT tokens to authenticate users instead of
-email parameters. The user identity is extracted from the verified JWT token.
+email parameters. The user identity is extracted from the verified JWT token
+(from its claims alone when JWT_STATELESS_USER is on, see appuser.authentication).
+The token is verified once per request; stacked permission classes and
+DRF's request.user share that result.
 """
 
 from rest_framework.permissions import BasePermission
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from appuser.authentication import LabJWTAuthentication
 from rest_framework.exceptions import AuthenticationFailed
 import logging
 
@@ -35,7 +38,7 @@ class IsLabAdmin(BasePermission):
             bool: True if user is authenticated and is admin, False otherwise
         """
         # Authenticate using JWT token from Authorization header
-        jwt_auth = JWTAuthentication()
+        jwt_auth = LabJWTAuthentication()
         
         try:
             # This returns (user, validated_token) or raises AuthenticationFailed
@@ -93,7 +96,7 @@ class IsLabAdminOrStudent(BasePermission):
             bool: True if user is authenticated, False otherwise
         """
         # Authenticate using JWT token from Authorization header
-        jwt_auth = JWTAuthentication()
+        jwt_auth = LabJWTAuthentication()
         
         try:
             # This returns (user, validated_token) or raises AuthenticationFailed
@@ -149,7 +152,7 @@ class IsLabStudent(BasePermission):
             bool: True if user is authenticated and is student, False otherwise
         """
         # Authenticate using JWT token
-        jwt_auth = JWTAuthentication()
+        jwt_auth = LabJWTAuthentication()
         
         try:
             user_auth = jwt_auth.authenticate(request)
@@ -184,7 +187,7 @@ class IsLabTeacher(BasePermission):
     message = "Teacher privileges required."
 
     def has_permission(self, request, view):
-        jwt_auth = JWTAuthentication()
+        jwt_auth = LabJWTAuthentication()
 
         try:
             user_auth = jwt_auth.authenticate(request)
@@ -213,7 +216,7 @@ class IsLabTeacherOrAdmin(BasePermission):
     message = "Teacher or admin privileges required."
 
     def has_permission(self, request, view):
-        jwt_auth = JWTAuthentication()
+        jwt_auth = LabJWTAuthentication()
 
         try:
             user_auth = jwt_auth.authenticate(request)
@@ -256,7 +259,7 @@ class IsAuthenticatedUser(BasePermission):
         Returns:
             bool: True if user is authenticated, False otherwise
         """
-        jwt_auth = JWTAuthentication()
+        jwt_auth = LabJWTAuthentication()
         
         try:
             user_auth = jwt_auth.authenticate(request)
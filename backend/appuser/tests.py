@@ -1,3 +1,102 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from appuser import authentication
+from appuser.authentication import DECODE_COUNT_ATTR, LabJWTAuthentication, revoke_user_tokens, user_from_claims
+from appuser.models import CustomUser
+from appuser.permissions import IsAuthenticatedUser, IsLabAdminOrStudent
+from appuser.views import get_tokens_for_user
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class DefaultAuthView(APIView):
+    """Stacked lab permissions behind DRF's stock simplejwt authentication"""
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsLabAdminOrStudent, IsAuthenticatedUser]
+
+    def get(self, request):
+        return Response({'email': request.user.email})
+
+
+class LabAuthView(DefaultAuthView):
+    authentication_classes = [LabJWTAuthentication]
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class LabJWTAuthenticationTests(TestCase):
+    """One token decode per request, and revoked tokens rejected"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = CustomUser.objects.create_user(email='student@example.com', first_name='Maria')
+        self.factory = APIRequestFactory()
+
+    def call(self, view_class, token):
+        request = self.factory.get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        decode = JWTAuthentication.get_validated_token
+        with mock.patch.object(
+            JWTAuthentication, 'get_validated_token', autospec=True, side_effect=decode
+        ) as decoded:
+            response = view_class.as_view()(request)
+        return request, response, decoded.call_count
+
+    def test_single_decode_behind_default_authentication(self):
+        request, response, decodes = self.call(DefaultAuthView, get_tokens_for_user(self.user)['access'])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(decodes, 1)
+        self.assertEqual(getattr(request, DECODE_COUNT_ATTR), 1)
+
+    def test_single_decode_behind_lab_authentication(self):
+        request, response, decodes = self.call(LabAuthView, get_tokens_for_user(self.user)['access'])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(decodes, 1)
+        self.assertEqual(getattr(request, DECODE_COUNT_ATTR), 1)
+
+    def test_revoked_token_rejected_behind_default_authentication(self):
+        token = get_tokens_for_user(self.user)['access']
+        revoke_user_tokens(self.user.pk)
+
+        _, response, _ = self.call(DefaultAuthView, token)
+
+        self.assertIn(response.status_code, (401, 403))
+
+    def test_revoked_token_rejected_behind_lab_authentication(self):
+        token = get_tokens_for_user(self.user)['access']
+        revoke_user_tokens(self.user.pk)
+
+        _, response, _ = self.call(LabAuthView, token)
+
+        self.assertEqual(response.status_code, 401)
+
+    @mock.patch.object(authentication, 'JWT_STATELESS_USER', True)
+    def test_revoked_token_rejected_in_stateless_mode(self):
+        token = get_tokens_for_user(self.user)['access']
+        revoke_user_tokens(self.user.pk)
+
+        _, response, _ = self.call(DefaultAuthView, token)
+
+        self.assertIn(response.status_code, (401, 403))
+
+    def test_deactivation_revokes_tokens(self):
+        token = get_tokens_for_user(self.user)['access']
+        self.user.is_active = False
+        self.user.save()
+
+        _, response, _ = self.call(LabAuthView, token)
+
+        self.assertEqual(response.status_code, 401)
+
+    def test_stateless_user_carries_the_name(self):
+        # AI prompts and their stored-analysis hashes use first_name
+        token = LabJWTAuthentication().get_validated_token(get_tokens_for_user(self.user)['access'])
+
+        self.assertEqual(user_from_claims(token).first_name, 'Maria')
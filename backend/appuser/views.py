@@ -6,12 +6,12 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
-from google.oauth2 import id_token
-from google.auth.transport import requests
 from django.conf import settings
 import logging
 
 from appuser.models import CustomUser
+from appuser.authentication import is_token_revoked
+from appuser.google_certs import verify_google_id_token
 from appuser.group_utils import check_user_groups
 
 logger = logging.getLogger(__name__)
@@ -23,6 +23,8 @@ def get_tokens_for_user(user):
     
     # Add custom claims to the token
     refresh['email'] = user.email
+    # Stateless authentication rebuilds the user from claims; the AI prompts use the name
+    refresh['first_name'] = user.first_name
     refresh['is_admin'] = user.is_admin
     refresh['is_teacher'] = user.is_teacher
     refresh['is_student'] = not user.is_admin and not user.is_teacher
@@ -54,11 +56,8 @@ class GoogleAuthView(APIView):
         
         try:
             # Verify the Google OAuth token
-            idinfo = id_token.verify_oauth2_token(
-                token_str, 
-                requests.Request(), 
-                settings.GOOGLE_CLIENT_ID
-            )
+            # Signature check against cached Google certificates
+            idinfo = verify_google_id_token(token_str, settings.GOOGLE_CLIENT_ID)
             
             email = idinfo.get("email")
             
@@ -159,6 +158,12 @@ class TokenRefreshView(APIView):
         
         try:
             refresh = RefreshToken(refresh_token)
+
+            if is_token_revoked(refresh):
+                return Response(
+                    {"error": "Refresh token has been revoked"},
+                    status=status.HTTP_401_UNAUTHORIZED
+                )
             
             return Response({
                 "access_token": str(refresh.access_token)
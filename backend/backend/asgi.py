@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_asgi_application()
+
+# Warm the Google certificate cache so the first login needs no download
+from appuser.google_certs import start_prefetch  # noqa: E402
+
+start_prefetch()
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_wsgi_application()
+
+# Warm the Google certificate cache so the first login needs no download
+from appuser.google_certs import start_prefetch  # noqa: E402
+
+start_prefetch()
@@ -0,0 +1,291 @@
+"""
+Per-user read-through cache for Google Classroom list calls.
+
+Entries live in the Django cache, keyed by the impersonated user and the
+resource, and are served as-is while younger than the resource's TTL.
+Once an entry expires it is revalidated against Classroom's ``updateTime``
+with a single one-item request; only when something changed (or the entry
+is older than ``CLASSROOM_CACHE_MAX_AGE``) is the full list fetched again.
+
+Dashboard endpoints can instead use stale-while-revalidate: an expired
+entry is returned immediately and refreshed in the background, as long as
+it is not older than ``CLASSROOM_CACHE_MAX_STALE``.
+"""
+
+import hashlib
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from classroom.google_service import get_my_submissions_by_coursework, iterate_list
+from classroom.parallel import submit_background
+
+logger = logging.getLogger(__name__)
+
+# Seconds an entry is served without contacting Google, per resource type.
+DEFAULT_TTLS = {
+    "courses": 300,
+    "visible_courses": 300,
+    "coursework": 120,
+    "announcements": 120,
+    "submissions": 120,
+}
+CACHE_TTLS = {**DEFAULT_TTLS, **getattr(settings, "CLASSROOM_CACHE_TTLS", {})}
+
+# Hard upper bound on entry age, even when revalidation says nothing changed
+# (revalidation cannot see deletions).
+MAX_AGE = getattr(settings, "CLASSROOM_CACHE_MAX_AGE", 3600)
+
+# Oldest entry stale-while-revalidate may serve before falling back to a live fetch.
+MAX_STALE = getattr(settings, "CLASSROOM_CACHE_MAX_STALE", 900)
+
+# How long a background refresh may hold its per-key lock.
+REFRESH_LOCK_TIMEOUT = 60
+
+# Request header admins can send to force a live fetch.
+BYPASS_HEADER = "HTTP_X_CLASSROOM_CACHE_BYPASS"
+
+
+def should_bypass_cache(request):
+    """Return True if an admin asked for live data via the X-Classroom-Cache-Bypass header."""
+    user = request.user
+    if not getattr(user, "is_admin", False):
+        return False
+    return request.META.get(BYPASS_HEADER, "").lower() in ("1", "true", "yes")
+
+
+def cache_key(user_email, resource, *parts):
+    """Build the cache key for a user's view of a resource."""
+    raw = ":".join([user_email.lower(), resource, *[str(p) for p in parts]])
+    return f"classroom:{resource}:{hashlib.sha256(raw.encode()).hexdigest()}"
+
+
+def course_generation(course_id):
+    """
+    Return the current cache generation of a course.
+
+    Course-scoped entries include the generation in their key, so bumping
+    it (see ``invalidate_course``) drops them for every user at once.
+    """
+    return cache.get(f"classroom:course_generation:{course_id}", 0)
+
+
+def course_parts(course_id):
+    """Key parts for a course-scoped resource."""
+    return (course_id, f"g{course_generation(course_id)}")
+
+
+def invalidate_course(course_id):
+    """Invalidate every user's cached coursework and announcements for a course."""
+    key = f"classroom:course_generation:{course_id}"
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # The key was evicted between add() and incr()
+        cache.set(key, 1, timeout=None)
+
+
+def newest_update_time(items):
+    """Return the most recent ``updateTime`` among items ('' if none)."""
+    return max((item.get("updateTime", "") for item in items), default="")
+
+
+def get_cached(user_email, resource, *parts):
+    """Return a fresh cached value or None, without contacting Google."""
+    entry = cache.get(cache_key(user_email, resource, *parts))
+    if entry and time.time() - entry["stored_at"] < CACHE_TTLS[resource]:
+        return entry["data"]
+    return None
+
+
+def set_cached(user_email, resource, data, *parts):
+    """Store a freshly fetched value for a user's view of a resource."""
+    entry = {
+        "data": data,
+        "version": _version_of(data),
+        "fetched_at": time.time(),
+        "stored_at": time.time(),
+    }
+    cache.set(cache_key(user_email, resource, *parts), entry, timeout=MAX_AGE)
+
+
+def invalidate(user_email, resource, *parts):
+    """Drop a cached value so the next read goes to Google."""
+    cache.delete(cache_key(user_email, resource, *parts))
+
+
+def cached_call(user_email, resource, parts, fetch, validate=None, bypass=False):
+    """
+    Read-through helper for a single Classroom resource.
+
+    Args:
+        user_email (str): Impersonated user the data belongs to
+        resource (str): Resource type, one of CACHE_TTLS
+        parts (tuple): Extra key parts (e.g. course ID)
+        fetch (callable): Returns the full, live value
+        validate (callable): Optional; returns the newest ``updateTime``
+            currently on the server, used to revalidate expired entries
+        bypass (bool): Skip the cache read and refresh the entry
+
+    Returns:
+        The cached or freshly fetched value.
+    """
+    key = cache_key(user_email, resource, *parts)
+    entry = None if bypass else cache.get(key)
+    now = time.time()
+
+    if entry:
+        if now - entry["stored_at"] < CACHE_TTLS[resource]:
+            logger.debug(f"Classroom cache hit: {resource} {parts} for {user_email}")
+            return entry["data"]
+
+        if validate is not None and now - entry["fetched_at"] < MAX_AGE:
+            try:
+                if validate() == entry["version"]:
+                    # Nothing changed upstream; extend the entry's freshness
+                    entry["stored_at"] = now
+                    cache.set(key, entry, timeout=MAX_AGE)
+                    logger.debug(f"Classroom cache revalidated: {resource} {parts} for {user_email}")
+                    return entry["data"]
+            except Exception as e:
+                logger.warning(f"Could not revalidate {resource} {parts} for {user_email}: {e}")
+
+    data = fetch()
+    set_cached(user_email, resource, data, *parts)
+    logger.debug(f"Classroom cache miss: {resource} {parts} for {user_email}")
+    return data
+
+
+def stale_while_revalidate(user_email, resource, parts, fetch, bypass=False, cacheable=None):
+    """
+    Serve a cached value immediately, refreshing it in the background once expired.
+
+    Args:
+        user_email (str): Impersonated user the data belongs to
+        resource (str): Resource type, one of CACHE_TTLS
+        parts (tuple): Extra key parts
+        fetch (callable): Returns the full, live value; must not touch the DB
+        bypass (bool): Skip the cache read and refresh the entry
+        cacheable (callable): Optional; values it rejects (e.g. partial
+            results) are returned but not stored
+
+    Returns:
+        tuple: (value, age in seconds of the returned value)
+
+    Entries older than MAX_STALE are never served; the caller then waits
+    for a live fetch as with a cold cache.
+    """
+    key = cache_key(user_email, resource, *parts)
+    entry = None if bypass else cache.get(key)
+
+    if entry:
+        age = time.time() - entry["fetched_at"]
+        if age < CACHE_TTLS[resource]:
+            return entry["data"], age
+        if age < MAX_STALE:
+            _schedule_refresh(key, user_email, resource, parts, fetch, cacheable)
+            return entry["data"], age
+
+    data = fetch()
+    if cacheable is None or cacheable(data):
+        set_cached(user_email, resource, data, *parts)
+    return data, 0
+
+
+def _schedule_refresh(key, user_email, resource, parts, fetch, cacheable=None):
+    """Start a background refresh of ``key`` unless one is already running."""
+    lock_key = f"{key}:refreshing"
+    if not cache.add(lock_key, True, timeout=REFRESH_LOCK_TIMEOUT):
+        return
+
+    def refresh():
+        try:
+            data = fetch()
+            if cacheable is not None and not cacheable(data):
+                # Keep serving the last complete value until a refresh succeeds
+                logger.warning(f"Not caching partial refresh of {resource} {parts} for {user_email}")
+                return
+            set_cached(user_email, resource, data, *parts)
+            logger.debug(f"Refreshed stale {resource} {parts} for {user_email}")
+        except Exception as e:
+            logger.warning(f"Background refresh of {resource} {parts} for {user_email} failed: {e}")
+        finally:
+            cache.delete(lock_key)
+
+    submit_background(refresh)
+
+
+def _version_of(data):
+    if isinstance(data, list):
+        return newest_update_time(data)
+    return None
+
+
+def get_courses_with_age(service, user_email, bypass=False, **list_kwargs):
+    """Stale-while-revalidate ``courses().list``; returns (courses, age)."""
+    parts = tuple(f"{k}={list_kwargs[k]}" for k in sorted(list_kwargs))
+    return stale_while_revalidate(
+        user_email,
+        "courses",
+        parts,
+        fetch=lambda: list(iterate_list(service.courses(), "courses", **list_kwargs)),
+        bypass=bypass,
+    )
+
+
+def get_coursework(service, user_email, course_id, bypass=False):
+    """Cached ``courseWork().list`` for a course, revalidated by ``updateTime``."""
+    def validate():
+        response = service.courses().courseWork().list(
+            courseId=course_id,
+            orderBy="updateTime desc",
+            pageSize=1,
+        ).execute()
+        return newest_update_time(response.get("courseWork", []))
+
+    return cached_call(
+        user_email,
+        "coursework",
+        course_parts(course_id),
+        fetch=lambda: list(iterate_list(
+            service.courses().courseWork(), "courseWork", courseId=course_id
+        )),
+        validate=validate,
+        bypass=bypass,
+    )
+
+
+def get_my_submissions(service, user_email, course_id, bypass=False):
+    """Cached submissions of the impersonated user in a course, keyed by courseWorkId."""
+    return cached_call(
+        user_email,
+        "submissions",
+        course_parts(course_id),
+        fetch=lambda: get_my_submissions_by_coursework(service, course_id),
+        bypass=bypass,
+    )
+
+
+def get_announcements(service, user_email, course_id, bypass=False):
+    """Cached ``announcements().list`` for a course, revalidated by ``updateTime``."""
+    def validate():
+        response = service.courses().announcements().list(
+            courseId=course_id,
+            orderBy="updateTime desc",
+            pageSize=1,
+        ).execute()
+        return newest_update_time(response.get("announcements", []))
+
+    return cached_call(
+        user_email,
+        "announcements",
+        course_parts(course_id),
+        fetch=lambda: list(iterate_list(
+            service.courses().announcements(), "announcements", courseId=course_id
+        )),
+        validate=validate,
+        bypass=bypass,
+    )
@@ -0,0 +1,105 @@
+"""
+Batching helper for independent Google API calls.
+
+Collects requests built from a googleapiclient service and sends them as
+``BatchHttpRequest`` round trips, mapping every response or error back to
+the key it was added under.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Google accepts at most this many calls in a single batch round trip.
+MAX_BATCH_SIZE = getattr(settings, "GOOGLE_BATCH_MAX_SIZE", 50)
+
+
+class GoogleBatch:
+    """
+    Queue independent API requests and execute them in as few round trips as possible.
+
+    Usage:
+        batch = GoogleBatch(service)
+        for cid in course_ids:
+            batch.add(cid, service.courses().get(id=cid))
+        results, errors = batch.execute()
+
+    ``results`` maps keys to API responses, ``errors`` maps keys to the
+    exception raised for that item, so callers can report partial failures
+    the same way they did with a per-item try/except.
+    """
+
+    def __init__(self, service, max_batch_size=MAX_BATCH_SIZE):
+        self.service = service
+        self.max_batch_size = max(1, min(max_batch_size, MAX_BATCH_SIZE))
+        self._pending = []
+        self.stats = {"requests": 0, "batches": 0, "errors": 0}
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, key, request):
+        """Queue a request (an unexecuted ``HttpRequest``) under ``key``."""
+        self._pending.append((key, request))
+
+    def execute(self, max_concurrency=1):
+        """
+        Send all queued requests and return ``(results, errors)``.
+
+        Items are grouped into chunks of ``max_batch_size``; a failure of
+        one item never affects the others. With ``max_concurrency`` > 1 up
+        to that many chunks are in flight at once.
+        """
+        results = {}
+        errors = {}
+        pending, self._pending = self._pending, []
+        chunks = [
+            pending[start:start + self.max_batch_size]
+            for start in range(0, len(pending), self.max_batch_size)
+        ]
+
+        if max_concurrency > 1 and len(chunks) > 1:
+            with ThreadPoolExecutor(max_workers=min(max_concurrency, len(chunks))) as executor:
+                list(executor.map(lambda chunk: self._execute_chunk(chunk, results, errors), chunks))
+        else:
+            for chunk in chunks:
+                self._execute_chunk(chunk, results, errors)
+
+        self.stats["batches"] += len(chunks)
+        self.stats["requests"] += len(pending)
+        self.stats["errors"] += len(errors)
+        logger.debug(
+            f"Executed {len(pending)} Google API calls in {len(chunks)} batches "
+            f"({len(errors)} failed)"
+        )
+        return results, errors
+
+    def _execute_chunk(self, chunk, results, errors):
+        """Send one BatchHttpRequest round trip, recording responses and errors by key."""
+        keys = {}
+
+        def callback(request_id, response, exception):
+            key = keys[request_id]
+            if exception is not None:
+                errors[key] = exception
+            else:
+                results[key] = response
+
+        batch = self.service.new_batch_http_request(callback=callback)
+        for index, (key, request) in enumerate(chunk):
+            request_id = str(index)
+            keys[request_id] = key
+            batch.add(request, request_id=request_id)
+
+        try:
+            batch.execute()
+        except Exception as e:
+            # The whole round trip failed; report it against every item
+            # in the chunk that did not already get a response.
+            logger.warning(f"Batch request of {len(chunk)} calls failed: {e}")
+            for key, _ in chunk:
+                if key not in results:
+                    errors.setdefault(key, e)
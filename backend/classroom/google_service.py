@@ -1,8 +1,22 @@
+import json
+import logging
 import os
+import threading
+from functools import lru_cache
+
+import google_auth_httplib2
+import httplib2
+from cachetools import LRUCache
 from google.oauth2 import service_account
-from googleapiclient.discovery import build
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.http import HttpRequest
 from django.conf import settings
 
+from classroom.token_broker import BrokeredCredentials
+
+logger = logging.getLogger(__name__)
+
 SERVICE_ACCOUNT_FILE = settings.SERVICE_ACCOUNT_FILE
 ADMIN_EMAIL = settings.GOOGLE_ADMIN_EMAIL
 
@@ -16,14 +30,179 @@ CLASSROOM_SCOPES = [
 
 ]
 
+CALENDAR_SCOPES = ["https://www.googleapis.com/auth/calendar.readonly"]
+
+# Maximum number of (api, subject, scopes) service objects kept per worker.
+SERVICE_POOL_SIZE = getattr(settings, "GOOGLE_SERVICE_POOL_SIZE", 256)
+
+# Optional directory of pinned discovery documents (``<api>.<version>.json``).
+DISCOVERY_DIR = getattr(settings, "GOOGLE_DISCOVERY_DIR", None)
+
+# Default ``pageSize`` for paginated list calls.
+LIST_PAGE_SIZE = getattr(settings, "CLASSROOM_LIST_PAGE_SIZE", 100)
+
+_service_pool = LRUCache(maxsize=SERVICE_POOL_SIZE)
+_service_pool_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def _load_service_account_info(path):
+    """Read and parse the service account key file once per process."""
+    with open(path) as key_file:
+        return json.load(key_file)
+
+
+@lru_cache(maxsize=None)
+def _base_credentials(scopes):
+    """
+    Return unsubjected service account credentials for a scope set.
+
+    Parsing the private key is the expensive part of building credentials,
+    so it happens once per scope set; ``with_subject`` reuses the signer.
+    """
+    info = _load_service_account_info(SERVICE_ACCOUNT_FILE)
+    return service_account.Credentials.from_service_account_info(info, scopes=list(scopes))
+
+
+@lru_cache(maxsize=None)
+def _discovery_document(api, version):
+    """
+    Load and parse the discovery document of an API once per process.
+
+    Documents come from GOOGLE_DISCOVERY_DIR when it holds ``<api>.<version>.json``,
+    otherwise from the copies shipped with the pinned google-api-python-client.
+    Nothing is fetched over the network.
+    """
+    doc_name = f"{api}.{version}.json"
+    if DISCOVERY_DIR and os.path.exists(os.path.join(DISCOVERY_DIR, doc_name)):
+        with open(os.path.join(DISCOVERY_DIR, doc_name)) as doc_file:
+            return json.load(doc_file)
+
+    content = get_static_doc(api, version)
+    if content is None:
+        raise ValueError(f"No bundled discovery document for {api} {version}")
+    return json.loads(content)
+
+
+def _build_service(api, version, credentials):
+    """
+    Build a service object that is safe to share between threads.
+
+    ``httplib2.Http`` is not thread-safe, so every request gets its own
+    transport while all of them share the same credentials object and
+    therefore the same access token until it expires.
+    """
+    def request_builder(http, *args, **kwargs):
+        authed_http = google_auth_httplib2.AuthorizedHttp(credentials, http=httplib2.Http())
+        return HttpRequest(authed_http, *args, **kwargs)
+
+    authed_http = google_auth_httplib2.AuthorizedHttp(credentials, http=httplib2.Http())
+    # build_from_document fills in method parameters in place; the additions
+    # are the same every time, so one parsed document serves every service.
+    return build_from_document(
+        _discovery_document(api, version),
+        http=authed_http,
+        requestBuilder=request_builder,
+    )
+
+
+def get_google_service(api, version, subject, scopes):
+    """
+    Return a pooled Google API service object impersonating ``subject``.
+
+    Services are kept in a process-wide LRU pool keyed by
+    (api, version, subject, scopes), so a warm worker skips discovery and
+    credential setup entirely. Access tokens are shared with the other
+    workers through the token broker.
+    """
+    scopes = tuple(sorted(scopes))
+    key = (api, version, subject, scopes)
+
+    with _service_pool_lock:
+        service = _service_pool.get(key)
+    if service is not None:
+        return service
+
+    credentials = BrokeredCredentials(_base_credentials(scopes).with_subject(subject), subject, scopes)
+    service = _build_service(api, version, credentials)
+
+    with _service_pool_lock:
+        # Another thread may have built the same service in the meantime;
+        # keep the first one so its token keeps being reused.
+        service = _service_pool.setdefault(key, service)
+
+    logger.debug(f"Built {api} {version} service for {subject}")
+    return service
+
+
+def clear_service_pool():
+    """Drop all pooled service objects (e.g. after rotating the key file)."""
+    with _service_pool_lock:
+        _service_pool.clear()
+    _base_credentials.cache_clear()
+    _load_service_account_info.cache_clear()
+    _discovery_document.cache_clear()
+
+
 def get_classroom_service(user_email):
     """
     Returns a Google Classroom service object impersonating the given user.
     """
-    creds = service_account.Credentials.from_service_account_file(
-        SERVICE_ACCOUNT_FILE,
-        scopes=CLASSROOM_SCOPES,
-    ).with_subject(user_email)
+    return get_google_service("classroom", "v1", user_email, CLASSROOM_SCOPES)
+
 
-    service = build("classroom", "v1", credentials=creds)
-    return service
\ No newline at end of file
+def get_calendar_service(user_email):
+    """
+    Returns a read-only Google Calendar service object impersonating the given user.
+    """
+    return get_google_service("calendar", "v3", user_email, CALENDAR_SCOPES)
+
+
+def iterate_list(collection, items_key, page_size=None, limit=None, page_size_param="pageSize", **params):
+    """
+    Lazily yield every item of a paginated Google API ``list`` call.
+
+    Args:
+        collection: Resource exposing ``list``/``list_next``
+            (e.g. ``service.courses().courseWork()``)
+        items_key (str): Response field holding the items (e.g. 'courseWork')
+        page_size (int): Items requested per page (defaults to LIST_PAGE_SIZE)
+        limit (int): Stop after this many items
+        page_size_param (str): Name of the page size argument
+            ('maxResults' for APIs such as Directory)
+        **params: Arguments for ``list`` (e.g. courseId, pageToken)
+
+    Pages are only requested as the caller consumes items, so breaking out
+    of the loop (or passing ``limit``) skips the remaining round trips.
+    """
+    params.setdefault(page_size_param, page_size or LIST_PAGE_SIZE)
+    request = collection.list(**params)
+    yielded = 0
+
+    while request is not None:
+        response = request.execute()
+        for item in response.get(items_key, []):
+            yield item
+            yielded += 1
+            if limit is not None and yielded >= limit:
+                return
+        request = collection.list_next(request, response)
+
+
+def get_my_submissions_by_coursework(service, course_id):
+    """
+    Return the impersonated user's submissions in a course, keyed by courseWorkId.
+
+    Uses the ``courseWorkId='-'`` listing so the whole course costs one
+    paginated call instead of one call per coursework item.
+    """
+    submissions = {}
+    for sub in iterate_list(
+        service.courses().courseWork().studentSubmissions(),
+        "studentSubmissions",
+        courseId=course_id,
+        courseWorkId="-",
+        userId="me",
+    ):
+        submissions.setdefault(sub.get("courseWorkId"), sub)
+    return submissions
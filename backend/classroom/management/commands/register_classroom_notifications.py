@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from classroom.notifications import register_course
+from classroom_admin.models import DisplayedCourse
+
+
+class Command(BaseCommand):
+    help = (
+        "Register Pub/Sub push notifications for coursework and roster changes of displayed courses. "
+        "Registrations expire after a week, so run this periodically."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--topic",
+            default=getattr(settings, "CLASSROOM_PUBSUB_TOPIC", ""),
+            help="Cloud Pub/Sub topic, e.g. projects/<project>/topics/<topic>",
+        )
+
+    def handle(self, *args, **options):
+        topic = options["topic"]
+        if not topic:
+            raise CommandError("No topic given and CLASSROOM_PUBSUB_TOPIC is not set")
+
+        for course_id in DisplayedCourse.objects.values_list("course_id", flat=True):
+            try:
+                registrations = register_course(course_id, topic)
+                self.stdout.write(f"Registered {len(registrations)} feeds for course {course_id}")
+            except Exception as e:
+                self.stderr.write(f"Failed to register course {course_id}: {e}")
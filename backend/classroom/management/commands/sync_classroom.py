@@ -0,0 +1,57 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from classroom.mirror import sync_displayed_courses
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Mirror courses, coursework, submissions and rosters of displayed courses into the local DB"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Ignore coursework watermarks and remove rows deleted upstream",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running as a background worker",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=300,
+            help="Seconds between syncs when running with --loop (default: 300)",
+        )
+        parser.add_argument(
+            "--full-interval",
+            type=int,
+            default=3600,
+            help="Seconds between full syncs when running with --loop, so deletions "
+            "upstream reach the mirror (default: 3600)",
+        )
+
+    def handle(self, *args, **options):
+        last_full = None
+        while True:
+            full = options["full"] or (
+                options["loop"]
+                and (last_full is None or time.monotonic() - last_full >= options["full_interval"])
+            )
+            if full:
+                last_full = time.monotonic()
+
+            stats = sync_displayed_courses(full=full)
+            self.stdout.write(
+                f"Synced {stats['synced']} courses ({stats['failed']} failed, "
+                f"{stats['rows']} rows written)"
+            )
+
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,349 @@
+"""
+Local mirror of Google Classroom data for displayed courses.
+
+``sync_displayed_courses`` (run by the ``sync_classroom`` management command)
+copies courses, coursework, submissions and rosters into the Mirrored* tables.
+Coursework is synced incrementally against an ``updateTime`` watermark; a
+``full`` sync also removes rows that disappeared upstream (the worker runs
+one every ``--full-interval`` seconds).
+
+The ``get_*`` helpers let views answer from the database. They return None
+when a course has not been synced recently (or the user is not on its
+roster), in which case callers fall back to live Classroom calls.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from classroom.google_service import get_google_service, iterate_list
+from classroom.models import MirroredCourse, MirroredCourseWork, MirroredSubmission, MirroredRosterEntry
+from classroom_admin.models import DisplayedCourse
+
+logger = logging.getLogger(__name__)
+
+# The sync reads every student's submissions and roster emails as the admin.
+# These scopes must be granted to the service account's domain-wide delegation.
+SYNC_SCOPES = [
+    "https://www.googleapis.com/auth/classroom.courses.readonly",
+    "https://www.googleapis.com/auth/classroom.coursework.students.readonly",
+    "https://www.googleapis.com/auth/classroom.rosters.readonly",
+    "https://www.googleapis.com/auth/classroom.profile.emails",
+]
+
+# Mirrored data older than this is ignored by the read helpers.
+MIRROR_MAX_AGE = getattr(settings, "CLASSROOM_MIRROR_MAX_AGE", 900)
+
+
+def _parse_time(value):
+    return parse_datetime(value) if value else None
+
+
+def get_sync_service():
+    """Classroom service used by the sync worker (impersonates the admin)."""
+    return get_google_service("classroom", "v1", settings.GOOGLE_ADMIN_EMAIL, SYNC_SCOPES)
+
+
+def sync_course(service, course_id, full=False):
+    """
+    Mirror one course and return the number of rows written.
+
+    Coursework is listed newest first and the listing stops at the stored
+    watermark unless ``full`` is set. Submissions and rosters are listed in
+    one paginated call each and only changed rows are written.
+    """
+    course_data = service.courses().get(id=course_id).execute()
+    written = 0
+
+    with transaction.atomic():
+        course, _ = MirroredCourse.objects.update_or_create(
+            course_id=course_id,
+            defaults={
+                "name": course_data.get("name", ""),
+                "section": course_data.get("section", ""),
+                "alternate_link": course_data.get("alternateLink", ""),
+                "update_time": _parse_time(course_data.get("updateTime")),
+            },
+        )
+
+        # Coursework: newest first, stop at the watermark on incremental syncs
+        watermark = None if full else course.coursework_watermark
+        newest = course.coursework_watermark
+        seen_coursework = set()
+
+        for work in iterate_list(
+            service.courses().courseWork(),
+            "courseWork",
+            courseId=course_id,
+            orderBy="updateTime desc",
+        ):
+            updated = _parse_time(work.get("updateTime"))
+            if watermark and updated and updated <= watermark:
+                break
+
+            MirroredCourseWork.objects.update_or_create(
+                coursework_id=work["id"],
+                defaults={
+                    "course": course,
+                    "title": work.get("title", ""),
+                    "description": work.get("description", ""),
+                    "state": work.get("state", ""),
+                    "due_date": work.get("dueDate"),
+                    "max_points": work.get("maxPoints"),
+                    "alternate_link": work.get("alternateLink", ""),
+                    "update_time": updated,
+                    "assignee_mode": work.get("assigneeMode", ""),
+                    "student_ids": work.get("individualStudentsOptions", {}).get("studentIds", []),
+                },
+            )
+            seen_coursework.add(work["id"])
+            written += 1
+            if updated and (newest is None or updated > newest):
+                newest = updated
+
+        if full:
+            MirroredCourseWork.objects.filter(course=course).exclude(
+                coursework_id__in=seen_coursework
+            ).delete()
+
+        written += _sync_submissions(service, course)
+        written += _sync_roster(service, course)
+
+        course.coursework_watermark = newest
+        course.synced_at = timezone.now()
+        course.save(update_fields=["coursework_watermark", "synced_at"])
+
+    return written
+
+
+def _sync_submissions(service, course):
+    """Mirror all submissions of a course, writing only rows whose updateTime changed."""
+    existing = dict(
+        MirroredSubmission.objects.filter(course=course).values_list("submission_id", "update_time")
+    )
+    to_create = []
+    to_update = []
+    seen = set()
+
+    for sub in iterate_list(
+        service.courses().courseWork().studentSubmissions(),
+        "studentSubmissions",
+        courseId=course.course_id,
+        courseWorkId="-",
+    ):
+        seen.add(sub["id"])
+        updated = _parse_time(sub.get("updateTime"))
+        if sub["id"] in existing and existing[sub["id"]] == updated:
+            continue
+
+        row = MirroredSubmission(
+            course=course,
+            coursework_id=sub.get("courseWorkId", ""),
+            submission_id=sub["id"],
+            user_id=sub.get("userId", ""),
+            state=sub.get("state", ""),
+            assigned_grade=sub.get("assignedGrade"),
+            update_time=updated,
+        )
+        (to_update if sub["id"] in existing else to_create).append(row)
+
+    if to_update:
+        # bulk_update matches on primary key, so look those up first
+        ids = dict(
+            MirroredSubmission.objects.filter(
+                submission_id__in=[r.submission_id for r in to_update]
+            ).values_list("submission_id", "id")
+        )
+        for row in to_update:
+            row.pk = ids[row.submission_id]
+        MirroredSubmission.objects.bulk_update(
+            to_update, ["coursework_id", "user_id", "state", "assigned_grade", "update_time"]
+        )
+    MirroredSubmission.objects.bulk_create(to_create)
+
+    stale = set(existing) - seen
+    if stale:
+        MirroredSubmission.objects.filter(course=course, submission_id__in=stale).delete()
+
+    return len(to_create) + len(to_update) + len(stale)
+
+
+def _sync_roster(service, course):
+    """Replace the mirrored roster of a course with the current students and teachers."""
+    current = {}
+    for role, collection, items_key in (
+        ("student", service.courses().students(), "students"),
+        ("teacher", service.courses().teachers(), "teachers"),
+    ):
+        for member in iterate_list(collection, items_key, courseId=course.course_id):
+            email = member.get("profile", {}).get("emailAddress", "").lower()
+            current[(member["userId"], role)] = email
+
+    existing = {
+        (e.user_id, e.role): e
+        for e in MirroredRosterEntry.objects.filter(course=course)
+    }
+
+    removed = [e.id for key, e in existing.items() if key not in current]
+    MirroredRosterEntry.objects.filter(id__in=removed).delete()
+
+    changed = []
+    for (user_id, role), email in current.items():
+        entry = existing.get((user_id, role))
+        if entry is None:
+            changed.append(MirroredRosterEntry(course=course, user_id=user_id, email=email, role=role))
+        elif entry.email != email:
+            entry.email = email
+            entry.save(update_fields=["email"])
+
+    MirroredRosterEntry.objects.bulk_create(changed)
+    return len(removed) + len(changed)
+
+
+def sync_displayed_courses(full=False):
+    """
+    Mirror every DisplayedCourse.
+
+    Returns:
+        dict: Number of courses synced, failed and rows written
+    """
+    service = get_sync_service()
+    course_ids = list(DisplayedCourse.objects.values_list("course_id", flat=True))
+    stats = {"synced": 0, "failed": 0, "rows": 0}
+
+    for course_id in course_ids:
+        try:
+            stats["rows"] += sync_course(service, course_id, full=full)
+            stats["synced"] += 1
+        except Exception as e:
+            logger.warning(f"Failed to mirror course {course_id}: {e}")
+            stats["failed"] += 1
+
+    if full:
+        # Courses that are no longer displayed are not kept up to date
+        MirroredCourse.objects.exclude(course_id__in=course_ids).delete()
+
+    logger.info(
+        f"Classroom mirror sync: {stats['synced']} courses, {stats['failed']} failed, "
+        f"{stats['rows']} rows written"
+    )
+    return stats
+
+
+def _fresh_course(course_id):
+    cutoff = timezone.now() - timedelta(seconds=MIRROR_MAX_AGE)
+    return MirroredCourse.objects.filter(course_id=course_id, synced_at__gte=cutoff).first()
+
+
+def _coursework_dict(work):
+    """Render a mirrored coursework row in the shape the Classroom API returns."""
+    return {
+        "id": work.coursework_id,
+        "title": work.title,
+        "description": work.description,
+        "state": work.state,
+        "dueDate": work.due_date,
+        "maxPoints": work.max_points,
+        "alternateLink": work.alternate_link,
+        "updateTime": work.update_time.isoformat() if work.update_time else "",
+        "assigneeMode": work.assignee_mode,
+        "individualStudentsOptions": {"studentIds": work.student_ids},
+    }
+
+
+def _assigned_to(work, user_id):
+    return work.assignee_mode != "INDIVIDUAL_STUDENTS" or user_id in work.student_ids
+
+
+def is_on_roster(course_id, email, role="student"):
+    """Whether a user is on a mirrored course's roster; None if the course isn't freshly mirrored."""
+    course = _fresh_course(course_id)
+    if course is None:
+        return None
+    return MirroredRosterEntry.objects.filter(course=course, email=email.lower(), role=role).exists()
+
+
+def get_student_course(course_id, email):
+    """
+    Return a student's view of a mirrored course, or None if unavailable.
+
+    Returns:
+        dict: 'course' (id, name, ...), 'coursework' (list in API shape) and
+        'submissions' (the student's submissions keyed by courseWorkId)
+    """
+    course = _fresh_course(course_id)
+    if course is None:
+        return None
+
+    entry = MirroredRosterEntry.objects.filter(
+        course=course, email=email.lower(), role="student"
+    ).first()
+    if entry is None:
+        return None
+
+    submissions = {
+        s.coursework_id: {
+            "courseWorkId": s.coursework_id,
+            "state": s.state,
+            "assignedGrade": s.assigned_grade,
+        }
+        for s in MirroredSubmission.objects.filter(course=course, user_id=entry.user_id)
+    }
+
+    return {
+        "course": {
+            "id": course.course_id,
+            "name": course.name,
+            "section": course.section,
+            "alternateLink": course.alternate_link,
+        },
+        # Like the API, students only see coursework assigned to them
+        "coursework": [
+            _coursework_dict(w) for w in course.coursework.all() if _assigned_to(w, entry.user_id)
+        ],
+        "submissions": submissions,
+    }
+
+
+def get_teacher_course_summary(course_id, email):
+    """
+    Return coursework with submission counts for a teacher of a mirrored course, or None.
+
+    Returns:
+        dict: 'coursework' (list in API shape), 'total_students' and 'counts'
+        mapping courseWorkId -> {'turned_in_count', 'graded_count'}
+    """
+    course = _fresh_course(course_id)
+    if course is None:
+        return None
+
+    if not MirroredRosterEntry.objects.filter(course=course, email=email.lower(), role="teacher").exists():
+        return None
+
+    counts = {
+        row["coursework_id"]: {
+            "turned_in_count": row["turned_in_count"],
+            "graded_count": row["graded_count"],
+        }
+        for row in MirroredSubmission.objects.filter(course=course)
+        .values("coursework_id")
+        .annotate(
+            turned_in_count=Count("id", filter=Q(state__in=["TURNED_IN", "RETURNED"])),
+            graded_count=Count("id", filter=Q(assigned_grade__isnull=False)),
+        )
+    }
+
+    coursework = [_coursework_dict(w) for w in course.coursework.all()]
+    for work in coursework:
+        counts.setdefault(work["id"], {"turned_in_count": 0, "graded_count": 0})
+
+    return {
+        "coursework": coursework,
+        "total_students": course.roster.filter(role="student").count(),
+        "counts": counts,
+    }
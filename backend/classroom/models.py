@@ -1,3 +1,79 @@
 from django.db import models
 
-# Create your models here.
+
+class MirroredCourse(models.Model):
+    """Local copy of a Google Classroom course maintained by the sync worker."""
+
+    course_id = models.CharField(max_length=32, unique=True)
+    name = models.CharField(max_length=255)
+    section = models.CharField(max_length=255, blank=True)
+    alternate_link = models.URLField(blank=True)
+    update_time = models.DateTimeField(null=True, blank=True)
+
+    # Newest coursework updateTime seen so far; incremental syncs stop there
+    coursework_watermark = models.DateTimeField(null=True, blank=True)
+    synced_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.course_id})"
+
+
+class MirroredCourseWork(models.Model):
+    course = models.ForeignKey(MirroredCourse, related_name='coursework', on_delete=models.CASCADE)
+    coursework_id = models.CharField(max_length=32, unique=True)
+    title = models.CharField(max_length=255)
+    description = models.TextField(blank=True)
+    state = models.CharField(max_length=32, blank=True)
+    due_date = models.JSONField(null=True, blank=True)
+    max_points = models.FloatField(null=True, blank=True)
+    alternate_link = models.URLField(blank=True)
+    update_time = models.DateTimeField(null=True, blank=True)
+    # INDIVIDUAL_STUDENTS coursework is only visible to the listed student user IDs
+    assignee_mode = models.CharField(max_length=32, blank=True)
+    student_ids = models.JSONField(default=list, blank=True)
+
+    class Meta:
+        ordering = ['-update_time']
+        indexes = [
+            models.Index(fields=['course', 'update_time']),
+        ]
+
+    def __str__(self):
+        return f"{self.title} ({self.coursework_id})"
+
+
+class MirroredSubmission(models.Model):
+    course = models.ForeignKey(MirroredCourse, related_name='submissions', on_delete=models.CASCADE)
+    coursework_id = models.CharField(max_length=32)
+    submission_id = models.CharField(max_length=64, unique=True)
+    user_id = models.CharField(max_length=64)
+    state = models.CharField(max_length=32, blank=True)
+    assigned_grade = models.FloatField(null=True, blank=True)
+    update_time = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['course', 'user_id']),
+            models.Index(fields=['course', 'coursework_id']),
+        ]
+
+    def __str__(self):
+        return f"{self.submission_id} ({self.state})"
+
+
+class MirroredRosterEntry(models.Model):
+    ROLES = [
+        ('student', 'Student'),
+        ('teacher', 'Teacher'),
+    ]
+
+    course = models.ForeignKey(MirroredCourse, related_name='roster', on_delete=models.CASCADE)
+    user_id = models.CharField(max_length=64)
+    email = models.EmailField(blank=True, db_index=True)
+    role = models.CharField(max_length=10, choices=ROLES)
+
+    class Meta:
+        unique_together = ('course', 'user_id', 'role')
+
+    def __str__(self):
+        return f"{self.email or self.user_id} - {self.role} - {self.course.course_id}"
@@ -0,0 +1,205 @@
+"""
+Google Classroom push notifications.
+
+Classroom publishes change events for registered feeds to a Cloud Pub/Sub
+topic; a push subscription delivers them to ``ClassroomNotificationView``.
+Each event invalidates the affected course's cache generation and, for
+mirrored courses, refreshes the mirror in the background, so cached data
+stays fresh without short TTLs.
+
+``LocalNotificationPublisher`` delivers the same envelopes to the endpoint
+through Django's test client, standing in for Pub/Sub in tests and local
+development.
+"""
+
+import base64
+import json
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+
+from classroom import cache as classroom_cache
+from classroom.google_service import get_google_service
+from classroom.mirror import get_sync_service, sync_course
+from classroom.models import MirroredCourse, MirroredCourseWork, MirroredSubmission, MirroredRosterEntry
+from classroom.parallel import submit_background
+
+logger = logging.getLogger(__name__)
+
+# Shared secret the Pub/Sub push subscription sends as ``?token=``.
+PUSH_TOKEN = getattr(settings, "CLASSROOM_PUSH_TOKEN", "")
+
+PUSH_SCOPES = ["https://www.googleapis.com/auth/classroom.push-notifications"]
+
+COURSEWORK_COLLECTIONS = (
+    "courses.courseWork",
+    "courses.courseWork.studentSubmissions",
+)
+ROSTER_COLLECTIONS = (
+    "courses.students",
+    "courses.teachers",
+)
+
+
+def decode_envelope(envelope):
+    """
+    Extract the Classroom event from a Pub/Sub push envelope.
+
+    Raises:
+        ValueError: If the envelope is malformed
+    """
+    try:
+        data = envelope["message"]["data"]
+        return json.loads(base64.b64decode(data).decode("utf-8"))
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"Malformed Pub/Sub envelope: {e}")
+
+
+def encode_envelope(event, message_id="local"):
+    """Wrap a Classroom event in a Pub/Sub push envelope."""
+    return {
+        "message": {
+            "data": base64.b64encode(json.dumps(event).encode("utf-8")).decode("ascii"),
+            "messageId": message_id,
+        },
+        "subscription": "local",
+    }
+
+
+def handle_event(event):
+    """
+    Apply a Classroom change event to the cache and the local mirror.
+
+    Returns:
+        str: What was done, for logging and the endpoint's response
+    """
+    collection = event.get("collection", "")
+    event_type = event.get("eventType", "")
+    resource_id = event.get("resourceId", {})
+    course_id = resource_id.get("courseId")
+
+    if not course_id:
+        logger.warning(f"Ignoring Classroom notification without courseId: {event}")
+        return "ignored"
+
+    if collection in COURSEWORK_COLLECTIONS:
+        classroom_cache.invalidate_course(course_id)
+
+        if event_type == "DELETED":
+            # Incremental syncs cannot see deletions, so apply them directly
+            if collection == "courses.courseWork":
+                MirroredCourseWork.objects.filter(coursework_id=resource_id.get("id")).delete()
+            else:
+                MirroredSubmission.objects.filter(submission_id=resource_id.get("id")).delete()
+
+    elif collection in ROSTER_COLLECTIONS:
+        classroom_cache.invalidate_course(course_id)
+
+        # The user's own course list changed; drop it if we know their email
+        user_id = resource_id.get("userId")
+        emails = MirroredRosterEntry.objects.filter(
+            course__course_id=course_id, user_id=user_id
+        ).exclude(email="").values_list("email", flat=True).distinct()
+        for email in emails:
+            classroom_cache.invalidate(email, "courses")
+
+    else:
+        logger.info(f"Ignoring Classroom notification for {collection}")
+        return "ignored"
+
+    _schedule_mirror_refresh(course_id)
+    logger.info(f"Applied Classroom {collection} {event_type} notification for course {course_id}")
+    return "applied"
+
+
+def _schedule_mirror_refresh(course_id):
+    """Re-sync a mirrored course in the background, at most one refresh at a time."""
+    if not MirroredCourse.objects.filter(course_id=course_id).exists():
+        return
+
+    lock_key = f"classroom:mirror_refresh:{course_id}"
+    if not cache.add(lock_key, True, timeout=60):
+        return
+
+    def refresh():
+        try:
+            sync_course(get_sync_service(), course_id)
+        except Exception as e:
+            logger.warning(f"Mirror refresh of course {course_id} failed: {e}")
+        finally:
+            cache.delete(lock_key)
+            close_old_connections()
+
+    submit_background(refresh)
+
+
+def register_course(course_id, topic_name):
+    """
+    Register Pub/Sub notifications for a course's coursework and roster changes.
+
+    Returns:
+        list: The created registrations
+    """
+    service = get_google_service("classroom", "v1", settings.GOOGLE_ADMIN_EMAIL, PUSH_SCOPES)
+    registrations = []
+
+    for feed in (
+        {"feedType": "COURSE_WORK_CHANGES", "courseWorkChangesInfo": {"courseId": course_id}},
+        {"feedType": "COURSE_ROSTER_CHANGES", "courseRosterChangesInfo": {"courseId": course_id}},
+    ):
+        registrations.append(service.registrations().create(body={
+            "feed": feed,
+            "cloudPubsubTopic": {"topicName": topic_name},
+        }).execute())
+
+    return registrations
+
+
+class LocalNotificationPublisher:
+    """
+    Stand-in for Cloud Pub/Sub that pushes Classroom events to the local endpoint.
+
+    Usage:
+        publisher = LocalNotificationPublisher()
+        publisher.publish_coursework_change(course_id, coursework_id, "MODIFIED")
+    """
+
+    def __init__(self, path="/api/classroom/notifications/", token=None):
+        from django.test import Client
+
+        self.client = Client()
+        self.path = path
+        self.token = PUSH_TOKEN if token is None else token
+        self.published = 0
+
+    def publish(self, event):
+        """Deliver one event and return the endpoint's response."""
+        self.published += 1
+        return self.client.post(
+            f"{self.path}?token={self.token}",
+            data=json.dumps(encode_envelope(event, message_id=str(self.published))),
+            content_type="application/json",
+        )
+
+    def publish_coursework_change(self, course_id, coursework_id, event_type="MODIFIED"):
+        return self.publish({
+            "collection": "courses.courseWork",
+            "eventType": event_type,
+            "resourceId": {"courseId": course_id, "id": coursework_id},
+        })
+
+    def publish_submission_change(self, course_id, coursework_id, submission_id, event_type="MODIFIED"):
+        return self.publish({
+            "collection": "courses.courseWork.studentSubmissions",
+            "eventType": event_type,
+            "resourceId": {"courseId": course_id, "courseWorkId": coursework_id, "id": submission_id},
+        })
+
+    def publish_roster_change(self, course_id, user_id, role="student", event_type="CREATED"):
+        return self.publish({
+            "collection": "courses.students" if role == "student" else "courses.teachers",
+            "eventType": event_type,
+            "resourceId": {"courseId": course_id, "userId": user_id},
+        })
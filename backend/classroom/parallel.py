@@ -0,0 +1,68 @@
+"""
+Concurrent execution of independent Google API calls within one request.
+
+Views hand a mapping of named callables to ``run_parallel``; all of them run
+on a shared worker pool and the request waits at most ``timeout`` seconds
+for the slowest one.
+"""
+
+import logging
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on the time a single request may spend waiting for its calls.
+DEFAULT_DEADLINE = getattr(settings, "CLASSROOM_REQUEST_DEADLINE", 20)
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, "CLASSROOM_FANOUT_WORKERS", 16),
+    thread_name_prefix="classroom-fanout",
+)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when the parallel calls of a request do not finish in time."""
+
+
+def run_parallel(tasks, timeout=DEFAULT_DEADLINE):
+    """
+    Run independent callables concurrently and return their results by name.
+
+    Args:
+        tasks (dict): Mapping of name -> zero-argument callable
+        timeout (float): Deadline in seconds for all tasks together
+
+    Returns:
+        dict: Mapping of name -> return value
+
+    Raises:
+        DeadlineExceeded: If the deadline passes before every task finished
+        Exception: The first exception raised by any task
+
+    As soon as one task fails or the deadline passes, tasks that have not
+    started yet are cancelled so they do not occupy the pool.
+    """
+    futures = {name: _executor.submit(fn) for name, fn in tasks.items()}
+    done, not_done = wait(futures.values(), timeout=timeout, return_when=FIRST_EXCEPTION)
+
+    failed = [f for f in done if f.exception() is not None]
+    if not_done and not failed:
+        for future in not_done:
+            future.cancel()
+        pending = [name for name, f in futures.items() if f in not_done]
+        logger.warning(f"Deadline of {timeout}s exceeded waiting for: {', '.join(pending)}")
+        raise DeadlineExceeded(f"Timed out waiting for {', '.join(pending)}")
+
+    if failed:
+        for future in not_done:
+            future.cancel()
+        raise failed[0].exception()
+
+    return {name: f.result() for name, f in futures.items()}
+
+
+def submit_background(fn):
+    """Run ``fn`` on the shared pool without waiting for it (fire-and-forget)."""
+    return _executor.submit(fn)
@@ -1,3 +1,357 @@
-from django.test import TestCase
+import time
+from datetime import datetime, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIRequestFactory
+
+from appuser.models import CustomUser
+from appuser.views import get_tokens_for_user
+from classroom import cache as classroom_cache
+from classroom import google_service, notifications
+from classroom.google_batch import GoogleBatch
+from classroom.models import MirroredCourse, MirroredCourseWork, MirroredRosterEntry
+from classroom.notifications import LocalNotificationPublisher, handle_event
+from classroom.token_broker import BrokeredCredentials
+from classroom.views import CourseDetailsView, VisibleCoursesView
+from classroom_admin.models import DisplayedCourse
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+@mock.patch('classroom.notifications.submit_background')
+class HandleEventTests(TestCase):
+    """handle_event: cache invalidation and mirror updates"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_coursework_change_bumps_course_generation(self, submit_background):
+        before = classroom_cache.course_generation('c1')
+
+        result = handle_event({
+            'collection': 'courses.courseWork',
+            'eventType': 'MODIFIED',
+            'resourceId': {'courseId': 'c1', 'id': 'w1'},
+        })
+
+        self.assertEqual(result, 'applied')
+        self.assertEqual(classroom_cache.course_generation('c1'), before + 1)
+        # Course not mirrored: nothing to refresh
+        submit_background.assert_not_called()
+
+    def test_bumped_generation_drops_cached_coursework(self, submit_background):
+        classroom_cache.set_cached('student@example.com', 'coursework', [{'id': 'w1'}],
+                                   *classroom_cache.course_parts('c1'))
+
+        handle_event({
+            'collection': 'courses.courseWork.studentSubmissions',
+            'eventType': 'MODIFIED',
+            'resourceId': {'courseId': 'c1', 'courseWorkId': 'w1', 'id': 's1'},
+        })
+
+        self.assertIsNone(classroom_cache.get_cached('student@example.com', 'coursework',
+                                                     *classroom_cache.course_parts('c1')))
+
+    def test_deleted_coursework_leaves_mirror_and_refreshes_it(self, submit_background):
+        course = MirroredCourse.objects.create(course_id='c1', name='Course')
+        MirroredCourseWork.objects.create(course=course, coursework_id='w1', title='Work')
+
+        handle_event({
+            'collection': 'courses.courseWork',
+            'eventType': 'DELETED',
+            'resourceId': {'courseId': 'c1', 'id': 'w1'},
+        })
+
+        self.assertFalse(MirroredCourseWork.objects.filter(coursework_id='w1').exists())
+        submit_background.assert_called_once()
+
+    def test_roster_change_invalidates_member_course_list(self, submit_background):
+        course = MirroredCourse.objects.create(course_id='c1', name='Course')
+        MirroredRosterEntry.objects.create(course=course, user_id='u1', email='student@example.com', role='student')
+        classroom_cache.set_cached('student@example.com', 'courses', [{'id': 'c1'}])
+
+        handle_event({
+            'collection': 'courses.students',
+            'eventType': 'DELETED',
+            'resourceId': {'courseId': 'c1', 'userId': 'u1'},
+        })
+
+        self.assertIsNone(classroom_cache.get_cached('student@example.com', 'courses'))
+
+    def test_event_without_course_is_ignored(self, submit_background):
+        self.assertEqual(handle_event({'collection': 'courses.courseWork', 'resourceId': {}}), 'ignored')
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+@mock.patch('classroom.notifications.PUSH_TOKEN', 'push-secret')
+@mock.patch('classroom.notifications.submit_background')
+class ClassroomNotificationViewTests(TestCase):
+    """End to end through the endpoint, with LocalNotificationPublisher standing in for Pub/Sub"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_published_change_is_applied(self, submit_background):
+        publisher = LocalNotificationPublisher(token='push-secret')
+
+        response = publisher.publish_coursework_change('c1', 'w1')
+
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(classroom_cache.course_generation('c1'), 1)
+
+    def test_invalid_token_is_rejected(self, submit_background):
+        response = LocalNotificationPublisher(token='wrong').publish_coursework_change('c1', 'w1')
+
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(classroom_cache.course_generation('c1'), 0)
+
+    def test_non_ascii_token_is_rejected(self, submit_background):
+        response = LocalNotificationPublisher(token='тайна').publish_coursework_change('c1', 'w1')
+
+        self.assertEqual(response.status_code, 403)
+
+    def test_malformed_envelope_is_rejected(self, submit_background):
+        publisher = LocalNotificationPublisher(token='push-secret')
+
+        response = publisher.client.post(
+            f"{publisher.path}?token=push-secret", data={'message': {}}, content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, 400)
+
+
+class FakeHttpBatch:
+    """BatchHttpRequest stand-in whose requests are course IDs; the ones in ``failing`` get a 403"""
+
+    def __init__(self, callback, failing):
+        self.callback = callback
+        self.failing = failing
+        self.requests = []
+
+    def add(self, request, request_id):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        for request_id, course_id in self.requests:
+            if course_id in self.failing:
+                self.callback(request_id, None, Exception(f"403 for {course_id}"))
+            else:
+                self.callback(request_id, {'id': course_id, 'name': f"Course {course_id}"}, None)
+
+
+def fake_classroom_service(failing=()):
+    service = mock.MagicMock()
+    service.courses.return_value.get.side_effect = lambda id: id
+    service.new_batch_http_request.side_effect = lambda callback: FakeHttpBatch(callback, set(failing))
+    return service
+
+
+class GoogleBatchTests(TestCase):
+    """Failures of single batched calls"""
+
+    def test_failed_item_does_not_drop_the_others(self):
+        service = fake_classroom_service(failing={'c2'})
+        batch = GoogleBatch(service, max_batch_size=2)
+        for course_id in ('c1', 'c2', 'c3'):
+            batch.add(course_id, service.courses().get(id=course_id))
+
+        results, errors = batch.execute()
+
+        self.assertEqual(set(results), {'c1', 'c3'})
+        self.assertEqual(set(errors), {'c2'})
+        self.assertEqual(batch.stats['batches'], 2)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class VisibleCoursesViewTests(TestCase):
+    """Batched fan-out over the visible courses"""
+
+    def setUp(self):
+        cache.clear()
+        self.student = CustomUser.objects.create_user(email='student@example.com')
+        for course_id in ('c1', 'c2', 'c3'):
+            DisplayedCourse.objects.create(course_id=course_id, name=course_id,
+                                           alternate_link=f"https://classroom.google.com/c/{course_id}")
+
+    def get(self):
+        token = get_tokens_for_user(self.student)['access']
+        request = APIRequestFactory().get('/api/classroom/visible-courses/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        return VisibleCoursesView.as_view()(request)
+
+    @mock.patch('classroom.views.get_classroom_service', return_value=fake_classroom_service(failing={'c2'}))
+    def test_failing_course_does_not_drop_the_others(self, get_service):
+        response = self.get()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([course['id'] for course in response.data['courses']], ['c1', 'c3'])
+        self.assertEqual(response.data['total_visible'], 3)
+
+    def test_partial_result_is_not_cached(self):
+        with mock.patch('classroom.views.get_classroom_service', return_value=fake_classroom_service(failing={'c2'})):
+            self.get()
+        with mock.patch('classroom.views.get_classroom_service', return_value=fake_classroom_service()):
+            response = self.get()
+
+        self.assertEqual(response.data['count'], 3)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+@mock.patch('classroom.cache.get_announcements', return_value=[])
+@mock.patch('classroom.cache.get_coursework', return_value=[{'id': 'w1', 'title': 'Work'}])
+@mock.patch('classroom.views.get_calendar_service')
+@mock.patch('classroom.views.get_classroom_service')
+class CourseDetailsViewTests(TestCase):
+    """The concurrent calls behind the course page"""
+
+    def setUp(self):
+        cache.clear()
+        self.student = CustomUser.objects.create_user(email='student@example.com')
+
+    def get(self, classroom_service, calendar_service):
+        classroom_service.return_value.courses.return_value.get.return_value.execute.return_value = {'name': 'Course'}
+        calendar_service.return_value.events.return_value.list.return_value.execute.return_value = {'items': []}
+        token = get_tokens_for_user(self.student)['access']
+        request = APIRequestFactory().get('/api/classroom/course/c1/details/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        return CourseDetailsView.as_view()(request, course_id='c1')
+
+    @mock.patch('classroom.views.get_my_submissions_by_coursework', return_value={'w1': {'state': 'CREATED'}})
+    def test_course_is_returned(self, submissions, classroom_service, calendar_service, coursework, announcements):
+        response = self.get(classroom_service, calendar_service)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([work['id'] for work in response.data['open_assignments']], ['w1'])
+
+    @mock.patch('classroom.views.get_my_submissions_by_coursework', side_effect=Exception('403 Forbidden'))
+    def test_failed_submissions_listing_keeps_the_course(self, submissions, classroom_service, calendar_service,
+                                                         coursework, announcements):
+        response = self.get(classroom_service, calendar_service)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['open_assignments'], [])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+@mock.patch('classroom.cache.submit_background')
+class StaleWhileRevalidateTests(TestCase):
+    """Background refreshes of expired entries"""
+
+    def setUp(self):
+        cache.clear()
+        classroom_cache.set_cached('student@example.com', 'courses', [{'id': 'c1'}])
+        # Past the TTL, within MAX_STALE
+        key = classroom_cache.cache_key('student@example.com', 'courses')
+        entry = cache.get(key)
+        entry['fetched_at'] = time.time() - classroom_cache.CACHE_TTLS['courses'] - 1
+        cache.set(key, entry)
+
+    def read(self, fetch):
+        return classroom_cache.stale_while_revalidate('student@example.com', 'courses', (), fetch)
+
+    def test_two_stale_reads_schedule_one_refresh(self, submit_background):
+        fetch = mock.Mock(return_value=[{'id': 'c2'}])
+
+        first, _ = self.read(fetch)
+        second, _ = self.read(fetch)
+
+        self.assertEqual(first, [{'id': 'c1'}])
+        self.assertEqual(second, [{'id': 'c1'}])
+        submit_background.assert_called_once()
+        fetch.assert_not_called()
+
+    def test_finished_refresh_is_served(self, submit_background):
+        self.read(mock.Mock(return_value=[{'id': 'c2'}]))
+        refresh = submit_background.call_args.args[0]
+
+        refresh()
+
+        data, age = self.read(mock.Mock())
+        self.assertEqual(data, [{'id': 'c2'}])
+        self.assertLess(age, classroom_cache.CACHE_TTLS['courses'])
+
+
+SCOPES = ('https://www.googleapis.com/auth/classroom.courses.readonly',)
+
+
+def delegated_credentials(token):
+    """Delegated credentials stand-in whose refresh mints ``token``, valid for an hour"""
+    delegated = mock.Mock()
+
+    def refresh(request):
+        delegated.token = token
+        delegated.expiry = datetime.utcnow() + timedelta(hours=1)
+
+    delegated.refresh.side_effect = refresh
+    return delegated
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class BrokeredCredentialsTests(TestCase):
+    """Access tokens shared between workers"""
+
+    def setUp(self):
+        cache.clear()
+
+    def credentials(self, token):
+        delegated = delegated_credentials(token)
+        return BrokeredCredentials(delegated, 'student@example.com', SCOPES), delegated
+
+    def test_second_worker_adopts_the_published_token(self):
+        first, first_delegated = self.credentials('token-1')
+        second, second_delegated = self.credentials('token-2')
+
+        first.refresh(None)
+        second.refresh(None)
+
+        self.assertEqual(second.token, 'token-1')
+        first_delegated.refresh.assert_called_once()
+        second_delegated.refresh.assert_not_called()
+
+    def test_waits_for_a_refresh_in_progress(self):
+        other, _ = self.credentials('token-1')
+        waiting, waiting_delegated = self.credentials('token-2')
+        # Another worker holds the lock and publishes while this one polls
+        cache.add(f"{waiting._key}:lock", True)
+
+        with mock.patch('classroom.token_broker.time.sleep', side_effect=lambda seconds: other._refresh_and_publish(None)):
+            waiting.refresh(None)
+
+        self.assertEqual(waiting.token, 'token-1')
+        waiting_delegated.refresh.assert_not_called()
+
+    def test_rejected_token_is_refreshed(self):
+        first, _ = self.credentials('token-1')
+        second, second_delegated = self.credentials('token-2')
+        first.refresh(None)
+        second.refresh(None)
+
+        # Asked again while holding the published token (e.g. after a 401)
+        second.refresh(None)
+
+        self.assertEqual(second.token, 'token-2')
+        second_delegated.refresh.assert_called_once()
+
+
+@mock.patch.object(google_service, '_build_service', side_effect=lambda api, version, credentials: mock.Mock())
+@mock.patch.object(google_service, '_base_credentials')
+class ServicePoolTests(TestCase):
+    """Process-wide pool of service objects"""
+
+    def setUp(self):
+        google_service.clear_service_pool()
+        self.addCleanup(google_service.clear_service_pool)
+
+    def test_same_key_reuses_the_service(self, base_credentials, build_service):
+        first = google_service.get_google_service('classroom', 'v1', 'student@example.com', SCOPES)
+        second = google_service.get_google_service('classroom', 'v1', 'student@example.com', SCOPES)
+
+        self.assertIs(first, second)
+        build_service.assert_called_once()
+
+    def test_other_subject_gets_its_own_service(self, base_credentials, build_service):
+        first = google_service.get_google_service('classroom', 'v1', 'student@example.com', SCOPES)
+        second = google_service.get_google_service('classroom', 'v1', 'teacher@example.com', SCOPES)
+
+        self.assertIsNot(first, second)
@@ -0,0 +1,94 @@
+"""
+Cross-worker broker for domain-wide delegation access tokens.
+
+Every worker process would otherwise mint its own access token for each
+(subject, scopes) pair. ``BrokeredCredentials`` wraps the delegated service
+account credentials and looks the token up in the Django cache first; only
+one process at a time refreshes a missing token (guarded by a ``cache.add``
+lock) and publishes it for the others until shortly before it expires.
+"""
+
+import hashlib
+import logging
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from google.auth import credentials as google_credentials
+
+logger = logging.getLogger(__name__)
+
+# Cached tokens are dropped this many seconds before they expire. Must stay
+# above google-auth's own refresh threshold (3m45s) or they are never used.
+TOKEN_EXPIRY_MARGIN = getattr(settings, "GOOGLE_TOKEN_EXPIRY_MARGIN", 300)
+
+# How long a refresh may hold the lock, and how long others wait for it.
+REFRESH_LOCK_TIMEOUT = 30
+REFRESH_WAIT = 5
+REFRESH_POLL_INTERVAL = 0.1
+
+
+def token_cache_key(subject, scopes):
+    digest = hashlib.sha256(f"{subject}|{' '.join(sorted(scopes))}".encode("utf-8")).hexdigest()
+    return f"google_token:{digest}"
+
+
+def _to_timestamp(expiry):
+    # google-auth keeps expiry as a naive UTC datetime
+    return expiry.replace(tzinfo=timezone.utc).timestamp()
+
+
+def _from_timestamp(timestamp):
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).replace(tzinfo=None)
+
+
+class BrokeredCredentials(google_credentials.Credentials):
+    """Credentials whose access token is shared between workers through the Django cache."""
+
+    def __init__(self, delegated, subject, scopes):
+        super().__init__()
+        self._delegated = delegated
+        self._key = token_cache_key(subject, scopes)
+        self._lock_key = f"{self._key}:lock"
+
+    def _adopt(self, entry):
+        if not entry or entry["expiry"] - time.time() <= TOKEN_EXPIRY_MARGIN:
+            return False
+        if entry["token"] == self.token:
+            # Asked to refresh the token we already hold (e.g. after a 401)
+            return False
+        self.token = entry["token"]
+        self.expiry = _from_timestamp(entry["expiry"])
+        return True
+
+    def refresh(self, request):
+        if self._adopt(cache.get(self._key)):
+            return
+
+        if cache.add(self._lock_key, True, timeout=REFRESH_LOCK_TIMEOUT):
+            try:
+                self._refresh_and_publish(request)
+            finally:
+                cache.delete(self._lock_key)
+            return
+
+        # Another worker is refreshing this token; wait for it to publish
+        deadline = time.monotonic() + REFRESH_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(REFRESH_POLL_INTERVAL)
+            if self._adopt(cache.get(self._key)):
+                return
+
+        logger.warning("Timed out waiting for a shared Google token refresh; refreshing locally")
+        self._refresh_and_publish(request)
+
+    def _refresh_and_publish(self, request):
+        self._delegated.refresh(request)
+        self.token = self._delegated.token
+        self.expiry = self._delegated.expiry
+
+        expires_at = _to_timestamp(self.expiry)
+        timeout = int(expires_at - time.time() - TOKEN_EXPIRY_MARGIN)
+        if timeout > 0:
+            cache.set(self._key, {"token": self.token, "expiry": expires_at}, timeout=timeout)
@@ -5,11 +5,20 @@ These views use JWT tokens to authenticate users instead of email parameters.
 The user's identity is extracted from the verified JWT token.
 """
 
+import hmac
 import logging
+import re
+from datetime import datetime, timedelta
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from classroom.google_service import get_classroom_service
+from classroom.google_batch import GoogleBatch
+from classroom.parallel import run_parallel, DeadlineExceeded
+from classroom import cache as classroom_cache
+from classroom import mirror
+from classroom import notifications
+from classroom.cache import should_bypass_cache
 from classroom_admin.models import DisplayedCourse
 from appuser.permissions import IsLabAdminOrStudent
 
@@ -45,16 +54,20 @@ class ClassroomCoursesView(APIView):
             # Get Google Classroom service using the authenticated user's email
             service = get_classroom_service(user.email)
             
-            # Fetch all courses the user has access to
-            courses_response = service.courses().list().execute()
-            courses = courses_response.get('courses', [])
+            # Fetch all courses the user has access to; a stale copy is served
+            # immediately while it is refreshed in the background
+            courses, age = classroom_cache.get_courses_with_age(
+                service, user.email, bypass=should_bypass_cache(request)
+            )
             
-            logger.info(f"Successfully fetched {len(courses)} courses for {user.email}")
+            logger.info(f"Successfully fetched {len(courses)} courses for {user.email} (age {int(age)}s)")
             
-            return Response({
+            response = Response({
                 "courses": courses,
                 "count": len(courses)
             }, status=status.HTTP_200_OK)
+            response["Age"] = str(int(age))
+            return response
             
         except Exception as e:
             logger.exception(f"Error fetching courses for {user.email}")
@@ -114,22 +127,42 @@ class VisibleCoursesView(APIView):
                     status=status.HTTP_200_OK
                 )
             
-            # Fetch each visible course from Google Classroom
-            courses = []
-            failed_courses = []
-            
-            for cid in course_ids:
-                try:
-                    course = service.courses().get(id=cid).execute()
-                    courses.append(course)
-                except Exception as e:
-                    logger.warning(f"Failed to fetch visible course {cid} for {user.email}: {e}")
-                    failed_courses.append(cid)
-            
-            logger.info(
-                f"Fetched {len(courses)}/{len(course_ids)} visible courses for {user.email} "
-                f"({len(failed_courses)} failed)"
+            def fetch_visible_courses():
+                # Fetch all visible courses from Google Classroom in batched round trips
+                batch = GoogleBatch(service)
+                for cid in course_ids:
+                    batch.add(cid, service.courses().get(id=cid))
+                results, errors = batch.execute()
+                
+                fetched = []
+                failed = []
+                
+                for cid in course_ids:
+                    if cid in results:
+                        fetched.append(results[cid])
+                    else:
+                        logger.warning(f"Failed to fetch visible course {cid} for {user.email}: {errors.get(cid)}")
+                        failed.append(cid)
+                
+                logger.info(
+                    f"Fetched {len(fetched)}/{len(course_ids)} visible courses for {user.email} "
+                    f"({len(failed)} failed, {batch.stats['batches']} batch requests)"
+                )
+                return {"courses": fetched, "failed_course_ids": failed}
+            
+            # Serve the last known payload immediately and refresh it in the
+            # background once it expires
+            payload, age = classroom_cache.stale_while_revalidate(
+                user.email,
+                "visible_courses",
+                tuple(sorted(course_ids)),
+                fetch=fetch_visible_courses,
+                bypass=should_bypass_cache(request),
+                # A course that failed once must not be reported as failed for the whole TTL
+                cacheable=lambda payload: not payload["failed_course_ids"],
             )
+            courses = payload["courses"]
+            failed_courses = payload["failed_course_ids"]
             
             response_data = {
                 "courses": courses,
@@ -141,7 +174,9 @@ class VisibleCoursesView(APIView):
             if failed_courses and user.is_admin:
                 response_data["failed_course_ids"] = failed_courses
             
-            return Response(response_data, status=status.HTTP_200_OK)
+            response = Response(response_data, status=status.HTTP_200_OK)
+            response["Age"] = str(int(age))
+            return response
             
         except Exception as e:
             logger.exception(f"Error fetching visible courses for {user.email}")
@@ -163,7 +198,11 @@ class CourseDetailsView(APIView):
     """
     
     # classroom/views.py
-from classroom.google_service import get_classroom_service
+from classroom.google_service import (
+    get_classroom_service,
+    get_calendar_service,
+    get_my_submissions_by_coursework,
+)
 
 class CourseDetailsView(APIView):
     """Get detailed info about a course for the student"""
@@ -176,80 +215,96 @@ class CourseDetailsView(APIView):
             classroom_service = get_classroom_service(user.email)
             
             # Get calendar service
-            from google.oauth2 import service_account
-            from googleapiclient.discovery import build
-            creds = service_account.Credentials.from_service_account_file(
-                'appuser/service_account.json',
-                scopes=['https://www.googleapis.com/auth/calendar.readonly'],
-                subject=user.email
-            )
-            calendar_service = build('calendar', 'v3', credentials=creds)
+            calendar_service = get_calendar_service(user.email)
             
-            # Get coursework
-            coursework_response = classroom_service.courses().courseWork().list(
-                courseId=course_id
-            ).execute()
-            coursework_list = coursework_response.get('courseWork', [])
+            bypass = should_bypass_cache(request)
             
-            # Process assignments
-            open_assignments = []
-            graded_assignments = []
+            def fetch_coursework():
+                return classroom_cache.get_coursework(
+                    classroom_service, user.email, course_id, bypass=bypass
+                )
             
-            for work in coursework_list:
+            def fetch_announcements():
+                return classroom_cache.get_announcements(
+                    classroom_service, user.email, course_id, bypass=bypass
+                )
+            
+            def fetch_submissions():
+                # Submissions are optional for the page (e.g. admins get 403/400);
+                # on failure the course is still returned, without assignment states
                 try:
-                    submissions_response = classroom_service.courses().courseWork().studentSubmissions().list(
-                        courseId=course_id,
-                        courseWorkId=work['id'],
-                        userId='me'
-                    ).execute()
-                    
-                    submissions = submissions_response.get('studentSubmissions', [])
-                    if submissions:
-                        sub = submissions[0]
-                        state = sub.get('state')
-                        
-                        if state in ['NEW', 'CREATED']:
-                            open_assignments.append({
-                                'id': work['id'],
-                                'title': work['title'],
-                                'dueDate': work.get('dueDate'),
-                                'maxPoints': work.get('maxPoints'),
-                            })
-                        elif state == 'RETURNED':
-                            graded_assignments.append({
-                                'id': work['id'],
-                                'title': work['title'],
-                                'grade': sub.get('assignedGrade'),
-                                'maxPoints': work.get('maxPoints')
-                            })
+                    return get_my_submissions_by_coursework(classroom_service, course_id)
                 except Exception as e:
-                    logger.warning(f"Error fetching submission for work {work['id']}: {e}")
-                    continue
-            
-            # Get announcements
-            announcements_response = classroom_service.courses().announcements().list(
-                courseId=course_id
-            ).execute()
-            announcements = announcements_response.get('announcements', [])
+                    logger.warning(f"Error fetching submissions for course {course_id}: {e}")
+                    return {}
             
-            # Get calendar events for this course
-            course_name = classroom_service.courses().get(id=course_id).execute().get('name')
+            def fetch_calendar_events():
+                # The Calendar query needs the course name, so it is chained
+                # after the course lookup inside the same task
+                course_name = classroom_service.courses().get(id=course_id).execute().get('name')
+                
+                now = datetime.utcnow()
+                time_min = now.isoformat() + 'Z'
+                time_max = (now + timedelta(days=30)).isoformat() + 'Z'
+                
+                return calendar_service.events().list(
+                    calendarId='primary',
+                    timeMin=time_min,
+                    timeMax=time_max,
+                    q=course_name,
+                    singleEvents=True,
+                    orderBy='startTime'
+                ).execute()
+            
+            tasks = {
+                'announcements': fetch_announcements,
+                'events': fetch_calendar_events,
+            }
             
-            from datetime import datetime, timedelta
-            import re
+            # Assignments come from the local mirror when the sync worker keeps
+            # this course up to date; otherwise they are fetched live
+            mirrored = mirror.get_student_course(course_id, user.email)
+            if mirrored is None:
+                tasks['coursework'] = fetch_coursework
+                # One paginated listing of the user's submissions, joined to coursework in memory
+                tasks['submissions'] = fetch_submissions
+            
+            # Independent calls run concurrently; the response waits only for the slowest
+            results = run_parallel(tasks)
+            if mirrored is not None:
+                results['coursework'] = mirrored['coursework']
+                results['submissions'] = mirrored['submissions']
+            
+            coursework_list = results['coursework']
+            submissions_by_work = results['submissions']
+            announcements = results['announcements']
+            events_result = results['events']
             
-            now = datetime.utcnow()
-            time_min = now.isoformat() + 'Z'
-            time_max = (now + timedelta(days=30)).isoformat() + 'Z'
+            # Process assignments
+            open_assignments = []
+            graded_assignments = []
             
-            events_result = calendar_service.events().list(
-                calendarId='primary',
-                timeMin=time_min,
-                timeMax=time_max,
-                q=course_name,
-                singleEvents=True,
-                orderBy='startTime'
-            ).execute()
+            for work in coursework_list:
+                sub = submissions_by_work.get(work['id'])
+                if not sub:
+                    continue
+                
+                state = sub.get('state')
+                
+                if state in ['NEW', 'CREATED']:
+                    open_assignments.append({
+                        'id': work['id'],
+                        'title': work['title'],
+                        'dueDate': work.get('dueDate'),
+                        'maxPoints': work.get('maxPoints'),
+                    })
+                elif state == 'RETURNED':
+                    graded_assignments.append({
+                        'id': work['id'],
+                        'title': work['title'],
+                        'grade': sub.get('assignedGrade'),
+                        'maxPoints': work.get('maxPoints')
+                    })
             
             # Process calendar events
             calendar_events = []
@@ -320,6 +375,9 @@ class CourseDetailsView(APIView):
                 'events_count': len(calendar_events)
             })
             
+        except DeadlineExceeded as e:
+            logger.warning(f"Course details for {course_id} timed out: {e}")
+            return Response({"error": str(e)}, status=status.HTTP_504_GATEWAY_TIMEOUT)
         except Exception as e:
             logger.exception(f"Error fetching course details for {course_id}")
             return Response({"error": str(e)}, status=500)
@@ -352,12 +410,10 @@ class CourseWorkView(APIView):
         try:
             service = get_classroom_service(user.email)
             
-            # Fetch coursework
-            coursework_response = service.courses().courseWork().list(
-                courseId=course_id
-            ).execute()
-            
-            coursework = coursework_response.get('courseWork', [])
+            # Fetch coursework (read-through cache)
+            coursework = classroom_cache.get_coursework(
+                service, user.email, course_id, bypass=should_bypass_cache(request)
+            )
             
             logger.info(f"Fetched {len(coursework)} coursework items for course {course_id}")
             
@@ -375,4 +431,45 @@ class CourseWorkView(APIView):
                     "course_id": course_id
                 },
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
\ No newline at end of file
+            )
+
+
+class ClassroomNotificationView(APIView):
+    """
+    Receive Google Classroom change notifications from a Pub/Sub push subscription.
+    
+    Authentication: shared secret in the ``token`` query parameter
+    (CLASSROOM_PUSH_TOKEN), configured on the push subscription URL.
+    """
+    
+    authentication_classes = []
+    permission_classes = []
+    
+    def post(self, request):
+        """
+        Invalidate cached and mirrored data affected by a Classroom event.
+        
+        Returns:
+            Response: 204 once handled; Pub/Sub retries on any other status
+            except 400/403, which are not worth retrying.
+        """
+        token = request.query_params.get('token', '')
+        if not notifications.PUSH_TOKEN or not hmac.compare_digest(
+            token.encode('utf-8'), notifications.PUSH_TOKEN.encode('utf-8')
+        ):
+            logger.warning("Rejected Classroom notification with invalid token")
+            return Response({"error": "Invalid token"}, status=status.HTTP_403_FORBIDDEN)
+        
+        try:
+            event = notifications.decode_envelope(request.data)
+        except ValueError as e:
+            logger.warning(str(e))
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            notifications.handle_event(event)
+        except Exception as e:
+            logger.exception("Error handling Classroom notification")
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -10,7 +10,7 @@ from rest_framework.response import Response
 from rest_framework import status
 from .models import DisplayedCourse
 from .serializers import DisplayedCourseSerializer
-from classroom.google_service import get_classroom_service
+from classroom.google_service import get_classroom_service, iterate_list
 from appuser.permissions import IsLabAdmin, IsLabTeacherOrAdmin
 import logging
 from django.conf import settings
@@ -33,9 +33,8 @@ class AdminCoursesListView(APIView):
         try:
             service = get_classroom_service(settings.GOOGLE_ADMIN_EMAIL)
 
-            # Fetch all active courses
-            courses_response = service.courses().list(courseStates=["ACTIVE"]).execute()
-            courses = courses_response.get("courses", [])
+            # Fetch all active courses, following every page
+            courses = list(iterate_list(service.courses(), "courses", courseStates=["ACTIVE"]))
 
             # DON'T auto-create DisplayedCourse entries
             # Just return the courses list
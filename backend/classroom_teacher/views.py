@@ -7,7 +7,9 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 
-from classroom.google_service import get_classroom_service
+from classroom.google_service import get_classroom_service, iterate_list, LIST_PAGE_SIZE
+from classroom.google_batch import GoogleBatch
+from classroom import mirror
 from appuser.permissions import IsLabTeacher
 from appuser.google_drive_service import (
     get_service_account_drive_service,
@@ -31,11 +33,12 @@ class TeacherCoursesListView(APIView):
 
         try:
             service = get_classroom_service(user.email)
-            courses_response = service.courses().list(
+            courses = list(iterate_list(
+                service.courses(),
+                "courses",
                 courseStates=["ACTIVE"],
                 teacherId="me",
-            ).execute()
-            courses = courses_response.get("courses", [])
+            ))
 
             logger.info(f"Teacher {user.email} fetched {len(courses)} courses")
 
@@ -65,72 +68,55 @@ class TeacherCourseDetailsView(APIView):
         user = request.user
 
         try:
-            service = get_classroom_service(user.email)
-
-            coursework_response = service.courses().courseWork().list(
-                courseId=course_id
-            ).execute()
-            coursework_list = coursework_response.get("courseWork", [])
+            # Answer from the local mirror when the sync worker keeps this
+            # course up to date; otherwise ask Classroom directly
+            summary = mirror.get_teacher_course_summary(course_id, user.email)
+            if summary is None:
+                summary = self._fetch_live_summary(user, course_id)
 
-            students_response = service.courses().students().list(
-                courseId=course_id
-            ).execute()
-            total_students = len(students_response.get("students", []))
+            coursework_list = summary["coursework"]
+            total_students = summary["total_students"]
+            counts = summary["counts"]
 
             now = datetime.utcnow()
             current_assignments = []
             previous_assignments = []
 
             for work in coursework_list:
-                try:
-                    submissions_response = service.courses().courseWork().studentSubmissions().list(
-                        courseId=course_id,
-                        courseWorkId=work["id"],
-                    ).execute()
-                    submissions = submissions_response.get("studentSubmissions", [])
-
-                    turned_in_count = sum(
-                        1 for s in submissions if s.get("state") in ["TURNED_IN", "RETURNED"]
-                    )
-                    graded_count = sum(
-                        1 for s in submissions if s.get("assignedGrade") is not None
-                    )
-
-                    assignment_data = {
-                        "id": work["id"],
-                        "title": work.get("title", ""),
-                        "description": work.get("description", ""),
-                        "dueDate": work.get("dueDate"),
-                        "maxPoints": work.get("maxPoints"),
-                        "state": work.get("state", ""),
-                        "total_students": total_students,
-                        "turned_in_count": turned_in_count,
-                        "graded_count": graded_count,
-                        "alternateLink": work.get("alternateLink", ""),
-                    }
-
-                    due_date = work.get("dueDate")
-                    is_past_due = False
-                    if due_date:
-                        try:
-                            due = datetime(
-                                due_date.get("year", now.year),
-                                due_date.get("month", 1),
-                                due_date.get("day", 1),
-                            )
-                            is_past_due = due < now
-                        except (ValueError, TypeError):
-                            pass
-
-                    if is_past_due:
-                        previous_assignments.append(assignment_data)
-                    else:
-                        current_assignments.append(assignment_data)
-
-                except Exception as e:
-                    logger.warning(f"Error fetching submissions for work {work['id']}: {e}")
+                if work["id"] not in counts:
                     continue
 
+                assignment_data = {
+                    "id": work["id"],
+                    "title": work.get("title", ""),
+                    "description": work.get("description", ""),
+                    "dueDate": work.get("dueDate"),
+                    "maxPoints": work.get("maxPoints"),
+                    "state": work.get("state", ""),
+                    "total_students": total_students,
+                    "turned_in_count": counts[work["id"]]["turned_in_count"],
+                    "graded_count": counts[work["id"]]["graded_count"],
+                    "alternateLink": work.get("alternateLink", ""),
+                }
+
+                due_date = work.get("dueDate")
+                is_past_due = False
+                if due_date:
+                    try:
+                        due = datetime(
+                            due_date.get("year", now.year),
+                            due_date.get("month", 1),
+                            due_date.get("day", 1),
+                        )
+                        is_past_due = due < now
+                    except (ValueError, TypeError):
+                        pass
+
+                if is_past_due:
+                    previous_assignments.append(assignment_data)
+                else:
+                    current_assignments.append(assignment_data)
+
             return Response({
                 "current_assignments": current_assignments,
                 "previous_assignments": previous_assignments,
@@ -143,6 +129,65 @@ class TeacherCourseDetailsView(APIView):
             logger.exception(f"Error fetching course details for teacher {user.email}, course {course_id}")
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    def _fetch_live_summary(self, user, course_id):
+        """Build the same summary as mirror.get_teacher_course_summary from live Classroom calls."""
+        service = get_classroom_service(user.email)
+
+        coursework_list = list(iterate_list(
+            service.courses().courseWork(), "courseWork", courseId=course_id
+        ))
+
+        # Only the roster size is needed, so students are counted as they stream in
+        total_students = sum(
+            1 for _ in iterate_list(service.courses().students(), "students", courseId=course_id)
+        )
+
+        # Submission listings for every assignment go out in batched round trips
+        batch = GoogleBatch(service)
+        for work in coursework_list:
+            batch.add(work["id"], service.courses().courseWork().studentSubmissions().list(
+                courseId=course_id,
+                courseWorkId=work["id"],
+                pageSize=LIST_PAGE_SIZE,
+            ))
+        submission_results, submission_errors = batch.execute()
+
+        counts = {}
+        for work in coursework_list:
+            if work["id"] not in submission_results:
+                logger.warning(
+                    f"Error fetching submissions for work {work['id']}: "
+                    f"{submission_errors.get(work['id'])}"
+                )
+                continue
+
+            submissions_response = submission_results[work["id"]]
+            submissions = submissions_response.get("studentSubmissions", [])
+            if submissions_response.get("nextPageToken"):
+                # Large classes: continue from the batched first page
+                submissions = submissions + list(iterate_list(
+                    service.courses().courseWork().studentSubmissions(),
+                    "studentSubmissions",
+                    courseId=course_id,
+                    courseWorkId=work["id"],
+                    pageToken=submissions_response["nextPageToken"],
+                ))
+
+            counts[work["id"]] = {
+                "turned_in_count": sum(
+                    1 for s in submissions if s.get("state") in ["TURNED_IN", "RETURNED"]
+                ),
+                "graded_count": sum(
+                    1 for s in submissions if s.get("assignedGrade") is not None
+                ),
+            }
+
+        return {
+            "coursework": coursework_list,
+            "total_students": total_students,
+            "counts": counts,
+        }
+
 
 class TeacherUploadPlanView(APIView):
     """Upload student individual plan PDF to Google Drive."""
@@ -0,0 +1,171 @@
+"""
+Local snapshot of the admin, student and teacher Google Group memberships.
+
+``sync_all_groups`` (run by the ``sync_group_members`` management command)
+pulls the full, paginated member list of each group into GroupMember and
+bumps the group's GroupSnapshot version. Role resolution at login and the
+admin group listing then read the snapshot with one indexed query and only
+call the Directory API when the snapshot is missing, stale or does not
+know the user.
+
+The snapshot lists derived memberships, so users of nested groups get
+the same roles hasMember would give them.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .group_utils import list_group_members
+from .models import GroupMember, GroupSnapshot
+
+logger = logging.getLogger(__name__)
+
+# Snapshots older than this are ignored and the live API is used instead.
+GROUP_SNAPSHOT_MAX_AGE = getattr(settings, 'GROUP_SNAPSHOT_MAX_AGE', 3600)
+
+
+def role_groups():
+    """Map of role flag -> group email for the groups that decide user roles."""
+    groups = {
+        'is_admin': settings.ADMIN_GROUP,
+        'is_student': settings.STUDENTS_GROUP,
+    }
+    if getattr(settings, 'TEACHERS_GROUP', None):
+        groups['is_teacher'] = settings.TEACHERS_GROUP
+    return groups
+
+
+def fetch_all_members(group_email):
+    """
+    Return every user member of a group, nested groups expanded, following all pages.
+
+    Each record carries ``direct``: False when the user is only a member
+    through a nested group.
+    """
+    direct = {m['email'].lower() for m in list_group_members(group_email) if m.get('email')}
+    members = list_group_members(group_email, include_derived=True)
+    # Nested groups are listed next to their members; only users hold roles
+    return [
+        {**m, 'direct': m['email'].lower() in direct}
+        for m in members if m.get('email') and m.get('type') != 'GROUP'
+    ]
+
+
+def sync_group(group_email):
+    """Replace the snapshot of one group and return its new version."""
+    members = fetch_all_members(group_email)
+
+    with transaction.atomic():
+        snapshot, _ = GroupSnapshot.objects.select_for_update().get_or_create(group_email=group_email)
+        version = snapshot.version + 1
+
+        GroupMember.objects.filter(group_email=group_email).delete()
+        GroupMember.objects.bulk_create([
+            GroupMember(
+                group_email=group_email,
+                member_email=m['email'].lower(),
+                role=m.get('role', ''),
+                version=version,
+                direct=m['direct'],
+            )
+            for m in members
+        ], ignore_conflicts=True)
+
+        snapshot.version = version
+        snapshot.member_count = len(members)
+        snapshot.synced_at = timezone.now()
+        snapshot.save()
+
+    logger.info(f"Synced {len(members)} members of {group_email} (version {version})")
+    return version
+
+
+def sync_all_groups():
+    """Sync every role group; returns group email -> new version (None on failure)."""
+    versions = {}
+    for group_email in role_groups().values():
+        try:
+            versions[group_email] = sync_group(group_email)
+        except Exception as e:
+            logger.error(f"Failed to sync members of {group_email}: {e}")
+            versions[group_email] = None
+    return versions
+
+
+def _fresh_groups(group_emails):
+    cutoff = timezone.now() - timedelta(seconds=GROUP_SNAPSHOT_MAX_AGE)
+    return set(
+        GroupSnapshot.objects.filter(
+            group_email__in=group_emails, synced_at__gte=cutoff
+        ).values_list('group_email', flat=True)
+    )
+
+
+def snapshot_members(group_email):
+    """Return the direct member emails of a group from a fresh snapshot, or None."""
+    if group_email not in _fresh_groups([group_email]):
+        return None
+    return list(
+        GroupMember.objects.filter(group_email=group_email, direct=True)
+        .order_by('member_email')
+        .values_list('member_email', flat=True)
+    )
+
+
+def snapshot_roles(user_email):
+    """
+    Resolve a user's role flags from fresh snapshots of all role groups.
+
+    Returns None on a snapshot miss: a role group has no fresh snapshot, or
+    the user is in none of them (they may have been added since the sync).
+    """
+    groups = role_groups()
+    if _fresh_groups(groups.values()) != set(groups.values()):
+        return None
+
+    member_of = set(
+        GroupMember.objects.filter(member_email=user_email.strip().lower()).values_list('group_email', flat=True)
+    )
+    if not member_of & set(groups.values()):
+        return None
+
+    roles = {flag: group in member_of for flag, group in groups.items()}
+    roles.setdefault('is_teacher', False)
+    roles['is_authorized'] = roles['is_admin'] or roles['is_student'] or roles['is_teacher']
+    return roles
+
+
+def nested_members(group_email):
+    """Emails of a group's members after expanding nested groups (one paginated listing)."""
+    return {m['email'].lower() for m in fetch_all_members(group_email)}
+
+
+def record_membership_change(email, group_email, added, still_member=None):
+    """
+    Apply a successful add/remove to the snapshot so it stays in step with Google.
+
+    For removals, ``still_member`` says whether the user remains in the group
+    through a nested group; bulk callers pass it from ``nested_members``,
+    otherwise it is checked live.
+    """
+    # appuser.group_utils imports this module
+    from appuser.group_utils import is_user_in_group
+
+    email = email.strip().lower()
+    if not added and still_member is None:
+        still_member = is_user_in_group(email, group_email)
+    if added:
+        GroupMember.objects.update_or_create(
+            group_email=group_email,
+            member_email=email,
+            defaults={'role': 'MEMBER', 'direct': True},
+        )
+    elif still_member:
+        # Still a member through a nested group: keeps the role, no longer listed
+        GroupMember.objects.filter(group_email=group_email, member_email=email).update(direct=False)
+    else:
+        GroupMember.objects.filter(group_email=group_email, member_email=email).delete()
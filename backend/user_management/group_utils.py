@@ -1,12 +1,14 @@
-from googleapiclient.discovery import build
-from google.oauth2 import service_account
+from googleapiclient.errors import HttpError
 from django.conf import settings
+from django.core.cache import cache
+from classroom.google_service import get_google_service, iterate_list
+from classroom.google_batch import GoogleBatch
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-# Load service account file 
+# Load service account file
 SERVICE_ACCOUNT_FILE = settings.SERVICE_ACCOUNT_FILE
 
 # Define the required scopes for Google Admin SDK
@@ -14,18 +16,56 @@ SCOPES = ['https://www.googleapis.com/auth/admin.directory.group',
             'https://www.googleapis.com/auth/admin.directory.group.member',
             'https://www.googleapis.com/auth/admin.directory.group.readonly',]
 
-# Create credentials using the service account file and impersonate the admin user
-creds = service_account.Credentials.from_service_account_file(
-    SERVICE_ACCOUNT_FILE,
-    scopes=SCOPES,
-    subject = settings.GOOGLE_ADMIN_EMAIL
-)
+# Directory API maximum for members().list
+MEMBERS_PAGE_SIZE = 200
+
+# Seconds a group's member list is cached (it is also dropped on every change)
+GROUP_MEMBERS_CACHE_TTL = getattr(settings, 'GROUP_MEMBERS_CACHE_TTL', 600)
+
+# Number of Directory batch round trips in flight at once during bulk changes
+BULK_MEMBERSHIP_CONCURRENCY = getattr(settings, 'BULK_MEMBERSHIP_CONCURRENCY', 4)
+
+
+def _get_directory_service():
+    """Return the pooled Directory service impersonating the admin user"""
+    return get_google_service('admin', 'directory_v1', settings.GOOGLE_ADMIN_EMAIL, SCOPES)
+
+
+def _members_cache_key(group_email):
+    return f"group_members:{group_email.lower()}"
+
+
+def list_group_members(group_email, include_derived=False):
+    """Fetch every member record of a Google Group live, following all pages
+
+    With include_derived, members of nested groups are listed as well
+    (as hasMember sees them), alongside the nested groups themselves.
+    """
+    service = _get_directory_service()
+    params = {'includeDerivedMembership': True} if include_derived else {}
+    return list(iterate_list(
+        service.members(),
+        'members',
+        page_size=MEMBERS_PAGE_SIZE,
+        page_size_param='maxResults',
+        groupKey=group_email,
+        **params,
+    ))
+
 
 def get_group_members(group_email):
-    """Get all members of a Google Group"""
-    service = build('admin', 'directory_v1', credentials=creds)
-    members = service.members().list(groupKey=group_email).execute()
-    return [m['email'] for m in members.get('members', [])]
+    """Get all member emails of a Google Group (cached until membership changes)"""
+    cache_key = _members_cache_key(group_email)
+    members = cache.get(cache_key)
+    if members is None:
+        members = sorted(m['email'] for m in list_group_members(group_email) if m.get('email'))
+        cache.set(cache_key, members, timeout=GROUP_MEMBERS_CACHE_TTL)
+    return members
+
+
+def invalidate_group_members(group_email):
+    """Drop the cached member list of a group"""
+    cache.delete(_members_cache_key(group_email))
 
 def add_user_to_group(email, group_email):
     """Add user to Google Group"""
@@ -34,10 +74,11 @@ def add_user_to_group(email, group_email):
         if not email or '@' not in email:
             logger.error(f"Invalid email format: {email}")
             return False
-        
-        service = build('admin', 'directory_v1', credentials=creds)
+
+        service = _get_directory_service()
         body = {"email": email.strip(), "role": "MEMBER"}
         service.members().insert(groupKey=group_email, body=body).execute()
+        invalidate_group_members(group_email)
         logger.info(f"Added {email} to {group_email}")
         return True
     except Exception as e:
@@ -50,11 +91,95 @@ def remove_user_from_group(email, group_email):
         if not email or '@' not in email:
             logger.error(f"Invalid email format: {email}")
             return False
-        
-        service = build('admin', 'directory_v1', credentials=creds)
+
+        service = _get_directory_service()
         service.members().delete(groupKey=group_email, memberKey=email.strip()).execute()
+        invalidate_group_members(group_email)
         logger.info(f"Removed {email} from {group_email}")
         return True
     except Exception as e:
         logger.error(f"Error removing {email}: {e}")
-        return False
\ No newline at end of file
+        return False
+
+
+def bulk_update_group_members(group_email, changes, current_members):
+    """Apply many add/remove changes to a Google Group.
+
+    Changes are diffed against the group's current membership, so adding an
+    existing member or removing a non-member is reported as 'unchanged'
+    without an API call. The remaining inserts/deletes go out as Directory
+    batch requests with bounded concurrency.
+
+    Args:
+        group_email (str): Target group
+        changes (list): (email, action) pairs, action being 'add' or 'remove'
+        current_members (iterable): Emails currently in the group
+
+    Returns:
+        list: One dict per input email with 'email', 'action' and 'status'
+        ('added', 'removed', 'unchanged', 'invalid' or 'failed', the last two
+        with an 'error'; invalid entries also carry 'code' 400)
+    """
+    members = {m.lower() for m in current_members}
+    service = _get_directory_service()
+    batch = GoogleBatch(service)
+    results = []
+    pending = {}
+
+    for email, action in changes:
+        if not isinstance(email, str) or not isinstance(action, str):
+            # Malformed JSON entry; reported, not applied
+            results.append({
+                "email": email, "action": action, "status": "invalid", "code": 400,
+                "error": "email and action must be strings",
+            })
+            continue
+
+        email = email.strip()
+        key = email.lower()
+        result = {"email": email, "action": action}
+        results.append(result)
+
+        if '@' not in email or action not in ('add', 'remove'):
+            result["status"] = "invalid"
+            result["code"] = 400
+            result["error"] = "Invalid email" if '@' not in email else "action must be 'add' or 'remove'"
+            continue
+        if key in pending:
+            # Duplicate line in the same upload; the first one wins
+            result["status"] = "unchanged"
+            continue
+        if (action == 'add') == (key in members):
+            result["status"] = "unchanged"
+            continue
+
+        pending[key] = result
+        if action == 'add':
+            batch.add(key, service.members().insert(
+                groupKey=group_email, body={"email": email, "role": "MEMBER"}
+            ))
+        else:
+            batch.add(key, service.members().delete(groupKey=group_email, memberKey=email))
+
+    responses, errors = batch.execute(max_concurrency=BULK_MEMBERSHIP_CONCURRENCY)
+
+    for key, result in pending.items():
+        error = errors.get(key)
+        status = getattr(getattr(error, 'resp', None), 'status', None)
+        if error is None:
+            result["status"] = "added" if result["action"] == 'add' else "removed"
+        elif isinstance(error, HttpError) and status in (409, 404):
+            # Already a member / already gone: membership changed since we read it
+            result["status"] = "unchanged"
+        else:
+            result["status"] = "failed"
+            result["error"] = str(error)
+
+    changed = sum(1 for r in results if r["status"] in ("added", "removed"))
+    if changed or errors:
+        invalidate_group_members(group_email)
+    logger.info(
+        f"Bulk membership update of {group_email}: {len(results)} requested, {changed} changed, "
+        f"{batch.stats['batches']} batch requests"
+    )
+    return results
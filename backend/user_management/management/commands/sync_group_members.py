@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from user_management.group_snapshot import sync_all_groups
+
+
+class Command(BaseCommand):
+    help = "Snapshot the admin, student and teacher Google Group members into the local DB"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running as a background worker",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=900,
+            help="Seconds between syncs when running with --loop (default: 900)",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            for group_email, version in sync_all_groups().items():
+                if version is None:
+                    self.stderr.write(f"Failed to sync {group_email}")
+                else:
+                    self.stdout.write(f"Synced {group_email} (version {version})")
+
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
@@ -23,9 +23,41 @@ class StudentIndividualPlan(models.Model):
     drive_web_link = models.URLField()
     uploaded_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    # PDF text, extracted at upload (or on first analysis), see plan_text
+    text = models.TextField(blank=True)
+    text_extracted = models.BooleanField(default=False)
+    # Summaries of the text's chunks for the AI assistant, keyed by chunk hash
+    chunk_summaries = models.JSONField(default=dict, blank=True)
     
     class Meta:
         ordering = ['-uploaded_at']
     
     def __str__(self):
-        return f"{self.student_email} - {self.file_name}"
\ No newline at end of file
+        return f"{self.student_email} - {self.file_name}"
+
+class GroupSnapshot(models.Model):
+    """Version stamp of the last membership sync of a Google Group."""
+    group_email = models.EmailField(unique=True)
+    version = models.PositiveIntegerField(default=0)
+    member_count = models.PositiveIntegerField(default=0)
+    synced_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.group_email} v{self.version} ({self.member_count} members)"
+
+
+class GroupMember(models.Model):
+    """One member of a Google Group as of the group's current snapshot version."""
+    group_email = models.EmailField()
+    member_email = models.EmailField(db_index=True)
+    role = models.CharField(max_length=20, blank=True)
+    version = models.PositiveIntegerField(default=0)
+    # False for members only through a nested group: they hold the role but can't be removed here
+    direct = models.BooleanField(default=True)
+
+    class Meta:
+        unique_together = ('group_email', 'member_email')
+        ordering = ['group_email', 'member_email']
+
+    def __str__(self):
+        return f"{self.member_email} ∈ {self.group_email}"
@@ -0,0 +1,61 @@
+"""
+Text of individual plan PDFs.
+
+The text is extracted once, when the plan is uploaded, and stored on the
+StudentIndividualPlan row. Plans uploaded before that, or whose extraction
+failed, are downloaded from Drive and extracted the first time their text
+is needed (see ``ensure_plan_text``).
+"""
+
+import io
+import logging
+
+from pypdf import PdfReader
+
+from appuser.google_drive_service import get_service_account_drive_service
+
+logger = logging.getLogger(__name__)
+
+
+def extract_pdf_text(source):
+    """Text of a PDF, one paragraph block per page. ``source`` is a path or a binary file object."""
+    reader = PdfReader(source)
+    pages = [(page.extract_text() or '').strip() for page in reader.pages]
+    return '\n\n'.join(page for page in pages if page)
+
+
+def store_plan_text(plan, text):
+    plan.text = text
+    plan.text_extracted = True
+    plan.save(update_fields=['text', 'text_extracted'])
+
+
+def ensure_plan_text(plan):
+    """
+    The plan's text, downloading and extracting the Drive copy if it was not stored at upload.
+
+    Returns '' for PDFs without a text layer (e.g. scans) and for files
+    pypdf cannot parse (corrupt, encrypted); that outcome is stored too, so
+    the failure is not retried on every analysis. A failed download also
+    returns '' but stores nothing, so the next analysis tries again.
+    """
+    if plan.text_extracted:
+        return plan.text
+
+    try:
+        service = get_service_account_drive_service()
+        content = service.files().get_media(fileId=plan.drive_file_id).execute()
+    except Exception as e:
+        logger.warning(f"Could not download plan {plan.drive_file_id} of {plan.student_email}: {e}")
+        return ''
+
+    try:
+        text = extract_pdf_text(io.BytesIO(content))
+    except Exception as e:
+        # The same bytes would fail the same way next time
+        logger.warning(f"Could not extract plan text for {plan.student_email}: {e}")
+        text = ''
+    store_plan_text(plan, text)
+
+    logger.info(f"Extracted plan text for {plan.student_email} ({len(text)} chars)")
+    return text
@@ -1,3 +1,35 @@
+from unittest import mock
+
 from django.test import TestCase
 
-# Create your tests here.
+from user_management import plan_text
+from user_management.models import StudentIndividualPlan
+
+
+class EnsurePlanTextTests(TestCase):
+    """Lazy extraction of plans whose text was not stored at upload"""
+
+    def setUp(self):
+        self.plan = StudentIndividualPlan.objects.create(
+            student_email='student@example.com',
+            file_name='plan.pdf',
+            drive_file_id='file-1',
+            drive_web_link='https://drive.google.com/file/d/file-1',
+        )
+
+    @mock.patch.object(plan_text, 'get_service_account_drive_service', side_effect=OSError('Drive unavailable'))
+    def test_download_failure_is_retried_later(self, drive):
+        self.assertEqual(plan_text.ensure_plan_text(self.plan), '')
+
+        self.plan.refresh_from_db()
+        self.assertFalse(self.plan.text_extracted)
+
+    @mock.patch.object(plan_text, 'get_service_account_drive_service')
+    def test_unparseable_pdf_is_stored_as_empty(self, drive):
+        drive.return_value.files.return_value.get_media.return_value.execute.return_value = b'not a pdf'
+
+        self.assertEqual(plan_text.ensure_plan_text(self.plan), '')
+
+        self.plan.refresh_from_db()
+        self.assertTrue(self.plan.text_extracted)
+        self.assertEqual(self.plan.text, '')
@@ -1,13 +1,14 @@
 # user_management/urls.py
 from django.urls import path
 from .views import (
-    GroupMembersView, ManageGroupMemberView, UploadStudentPlanView, MyIndividualPlanView,
+    GroupMembersView, ManageGroupMemberView, BulkManageGroupMembersView, UploadStudentPlanView, MyIndividualPlanView,
     SupervisionsView, MySupervisionView, MyDoctoralStudentsView, AdminAllIndividualPlansView, AdminUsersWithPlansView,
 )
 
 urlpatterns = [
     path('group-members/', GroupMembersView.as_view()),
     path('manage-member/', ManageGroupMemberView.as_view()),
+    path('manage-members/bulk/', BulkManageGroupMembersView.as_view()),
     path('upload-plan/', UploadStudentPlanView.as_view()),
     path('my-plan/', MyIndividualPlanView.as_view()),
     path('supervisions/', SupervisionsView.as_view()),
@@ -3,7 +3,16 @@ from rest_framework.response import Response
 from rest_framework import status
 from django.conf import settings
 from appuser.permissions import IsLabAdmin, IsLabAdminOrStudent, IsLabTeacherOrAdmin
-from .group_utils import get_group_members, add_user_to_group, remove_user_from_group
+from .group_utils import (
+    get_group_members,
+    list_group_members,
+    add_user_to_group,
+    remove_user_from_group,
+    bulk_update_group_members,
+)
+from .group_snapshot import snapshot_members, record_membership_change, nested_members
+from appuser.group_utils import invalidate_user_groups
+from appuser.authentication import revoke_tokens_for_email
 from appuser.models import CustomUser
 from appuser.google_drive_service import (
     get_service_account_drive_service,
@@ -12,11 +21,27 @@ from appuser.google_drive_service import (
     share_file_with_users,
 )
 from .models import StudentIndividualPlan, Supervision
-import logging, os
+from .plan_text import extract_pdf_text
+import base64, bisect, csv, io, logging, os
 from rest_framework.exceptions import APIException
 
 logger = logging.getLogger(__name__)
 
+# Upper bound for ?page_size= on the group member listing
+MAX_MEMBERS_PAGE_SIZE = 500
+
+
+def _encode_cursor(email):
+    return base64.urlsafe_b64encode(email.encode('utf-8')).decode('ascii')
+
+
+def _decode_cursor(cursor):
+    try:
+        return base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid cursor")
+
+
 class GroupMembersView(APIView):
     """Get members of admin or student group"""
     permission_classes = [IsLabAdmin]
@@ -34,8 +59,34 @@ class GroupMembersView(APIView):
             else:
                 return Response({"error": "Invalid group"}, status=400)
             
-            members = get_group_members(group)
-            return Response({"members": members}, status=200)
+            # Served from the synced snapshot; cached Directory listing on a miss
+            members = snapshot_members(group)
+            if members is None:
+                members = get_group_members(group)
+            members = sorted(members)
+
+            cursor = request.query_params.get('cursor')
+            page_size = request.query_params.get('page_size')
+            if not cursor and not page_size:
+                # Unpaginated: the whole list, as before
+                return Response({"members": members, "total": len(members)}, status=200)
+
+            try:
+                page_size = min(int(page_size or MAX_MEMBERS_PAGE_SIZE), MAX_MEMBERS_PAGE_SIZE)
+                if page_size < 1:
+                    raise ValueError("page_size must be positive")
+                # Keyset cursor: the page starts after the last email of the previous one
+                start = bisect.bisect_right(members, _decode_cursor(cursor)) if cursor else 0
+            except ValueError as e:
+                return Response({"error": str(e)}, status=400)
+
+            page = members[start:start + page_size]
+            has_more = start + page_size < len(members)
+            return Response({
+                "members": page,
+                "next_cursor": _encode_cursor(page[-1]) if has_more else None,
+                "total": len(members),
+            }, status=200)
     except Exception as e:
         logger.error(f"Error fetching group members: {str(e)}")
         raise APIException("Failed to fetch group members")
@@ -64,9 +115,102 @@ class ManageGroupMemberView(APIView):
         else:
             success = remove_user_from_group(email, group_email)
         
+        # The user's roles changed; the next login must ask Google again and
+        # tokens carrying the old role claims stop working
+        if success:
+            invalidate_user_groups(email)
+            revoke_tokens_for_email(email)
+            record_membership_change(email, group_email, added=(action == 'add'))
+        
         return Response({"success": success}, status=200)
     
 
+class BulkManageGroupMembersView(APIView):
+    """Add or remove many members of a group in one call.
+
+    Request Body (JSON):
+        group (str): 'admin', 'student' or 'teacher'
+        changes (list): [{"email": ..., "action": "add" | "remove"}, ...]
+        or emails (list) together with a single action (default: 'add')
+
+    Or multipart with a CSV ``file`` of ``email[,action]`` rows (an optional
+    header row is skipped) plus ``group`` and a default ``action``.
+    """
+    permission_classes = [IsLabAdmin]
+
+    def post(self, request):
+        group = request.data.get('group')
+
+        if group == 'admin':
+            group_email = settings.ADMIN_GROUP
+        elif group == 'student':
+            group_email = settings.STUDENTS_GROUP
+        elif group == 'teacher':
+            group_email = settings.TEACHERS_GROUP
+        else:
+            return Response({"error": "Invalid group"}, status=400)
+
+        default_action = request.data.get('action', 'add')
+        uploaded_file = request.FILES.get('file')
+
+        if uploaded_file:
+            try:
+                rows = csv.reader(io.StringIO(uploaded_file.read().decode('utf-8-sig')))
+            except UnicodeDecodeError:
+                return Response({"error": "CSV file must be UTF-8 encoded"}, status=400)
+            changes = [
+                (row[0], (row[1].strip().lower() if len(row) > 1 and row[1].strip() else default_action))
+                for row in rows
+                if row and row[0].strip() and row[0].strip().lower() != 'email'
+            ]
+        elif isinstance(request.data.get('changes'), list):
+            # Non-object entries come back as 'invalid' results instead of failing the request
+            changes = [
+                (item.get('email'), item.get('action', default_action)) if isinstance(item, dict) else (item, None)
+                for item in request.data['changes']
+            ]
+        elif isinstance(request.data.get('emails'), list):
+            changes = [(email, default_action) for email in request.data['emails']]
+        else:
+            return Response({"error": "Provide changes, emails or a CSV file"}, status=400)
+
+        if not changes:
+            return Response({"error": "No emails given"}, status=400)
+
+        try:
+            current_members = [m['email'] for m in list_group_members(group_email) if m.get('email')]
+            results = bulk_update_group_members(group_email, changes, current_members)
+        except Exception as e:
+            logger.exception(f"Error in bulk membership update of {group_email}")
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        # Whether removed users are still in through a nested group: one listing, not a check per email
+        remaining = None
+        if any(result["status"] == "removed" for result in results):
+            try:
+                remaining = nested_members(group_email)
+            except Exception as e:
+                logger.warning(f"Could not list nested members of {group_email}: {e}")
+                remaining = set()
+
+        for result in results:
+            if result["status"] in ("added", "removed"):
+                invalidate_user_groups(result["email"])
+                revoke_tokens_for_email(result["email"])
+                record_membership_change(
+                    result["email"], group_email, added=(result["status"] == "added"),
+                    still_member=remaining is not None and result["email"].lower() in remaining,
+                )
+
+        summary = {}
+        for result in results:
+            summary[result["status"]] = summary.get(result["status"], 0) + 1
+
+        logger.info(f"Admin {request.user.email} bulk-updated {group_email}: {summary}")
+
+        return Response({"results": results, "summary": summary}, status=200)
+
+
 class UploadStudentPlanView(APIView):
     """Upload student individual plan PDF to Google Drive and share with student
     """
@@ -101,8 +245,11 @@ class UploadStudentPlanView(APIView):
             existing_plan = StudentIndividualPlan.objects.filter(
                 student_email=student_email
             ).first()
+            previous_summaries = {}
             
             if existing_plan:
+                # Chunks the new version shares with the old one keep their AI summaries
+                previous_summaries = existing_plan.chunk_summaries
                 # Delete old file from Drive
                 try:
                     service.files().delete(fileId=existing_plan.drive_file_id).execute()
@@ -120,6 +267,13 @@ class UploadStudentPlanView(APIView):
                 for chunk in uploaded_file.chunks():
                     destination.write(chunk)
             
+            # Extract the text once for the AI assistant; if it fails, the first analysis retries
+            try:
+                text = extract_pdf_text(temp_path)
+            except Exception as e:
+                logger.warning(f"Could not extract plan text for {student_email}: {e}")
+                text = None
+            
             # Generate filename
             filename = f"{student_email.split('@')[0]}_individual_plan.pdf"
             
@@ -146,7 +300,10 @@ class UploadStudentPlanView(APIView):
                 file_name=filename,
                 drive_file_id=result['file_id'],
                 drive_web_link=result['web_link'],
-                uploaded_by=user
+                uploaded_by=user,
+                text=text or '',
+                text_extracted=text is not None,
+                chunk_summaries=previous_summaries,
             )
             
             # Clean up
@@ -11,11 +11,67 @@ import {
 import { useTranslation } from "react-i18next";
 import api from "../../../api.js";
 
+const ANALYZE_URL = '/api/ai-assistant/analyze/async/';
+
+// Posts an analysis request as Server-Sent Events (axios can't read a streamed body):
+// calls onToken with each text fragment and resolves with the final 'done' payload
+const streamAnalysis = async (body, onToken) => {
+  const res = await fetch(`${api.defaults.baseURL}${ANALYZE_URL}`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      Accept: 'text/event-stream',
+      Authorization: `Bearer ${localStorage.getItem('access_token')}`,
+    },
+    body: JSON.stringify({ ...body, stream: true }),
+  });
+
+  if (res.status === 401) {
+    // Expired token: the api client refreshes it and retries
+    const retry = await api.post(ANALYZE_URL, body);
+    return retry.data;
+  }
+  if (!res.ok) {
+    const data = await res.json().catch(() => ({}));
+    throw new Error(data.error || data.detail || 'Failed to generate analysis');
+  }
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let end;
+    while ((end = buffer.indexOf('\n\n')) !== -1) {
+      const message = buffer.slice(0, end);
+      buffer = buffer.slice(end + 2);
+
+      let event = 'message';
+      let data = '';
+      for (const line of message.split('\n')) {
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        else if (line.startsWith('data:')) data += line.slice(5).trim();
+      }
+      const payload = data ? JSON.parse(data) : {};
+
+      if (event === 'token') onToken(payload.text);
+      else if (event === 'done') return payload;
+      else if (event === 'error') throw new Error(payload.error || 'Failed to generate analysis');
+    }
+  }
+  throw new Error('The analysis stream ended unexpectedly');
+};
+
 const AIAssistant = forwardRef(({ user }, ref) => {
 
   const { t } = useTranslation();
   const [open, setOpen] = useState(false);
   const [loading, setLoading] = useState(false);
+  const [running, setRunning] = useState(false);
   const [summary, setSummary] = useState(null);
   const [analysisType, setAnalysisType] = useState(null);
   const [error, setError] = useState(null);
@@ -32,61 +88,34 @@ const AIAssistant = forwardRef(({ user }, ref) => {
     }
   }));
 
-  const getOverallSummary = async () => {
-    setLoading(true);
-    setError(null);
-    setAnalysisType('overall');
-    
-    try {
-      const res = await api.post('/api/ai-assistant/analyze/', {
-        type: 'overall'
-      });
-      
-      setSummary(res.data.summary);
-    } catch (error) {
-      console.error('AI analysis error:', error);
-      setError(error.response?.data?.error || 'Failed to generate analysis');
-    } finally {
-      setLoading(false);
-    }
-  };
+  const getOverallSummary = () => runAnalysis({ type: 'overall' }, 'overall');
 
-  const getCourseSummary = async (courseId, courseName) => {
-    setLoading(true);
-    setError(null);
-    setAnalysisType(`course-${courseName}`);
-    
-    try {
-      const res = await api.post('/api/ai-assistant/analyze/', {
-        type: 'course',
-        course_id: courseId
-      });
-      
-      setSummary(res.data.summary);
-    } catch (error) {
-      console.error('AI analysis error:', error);
-      setError(error.response?.data?.error || 'Failed to generate analysis');
-    } finally {
-      setLoading(false);
-    }
-  };
+  const getCourseSummary = (courseId, courseName) =>
+    runAnalysis({ type: 'course', course_id: courseId }, `course-${courseName}`);
 
-  const getPlanAnalysis = async () => {
+  const getPlanAnalysis = () => runAnalysis({ type: 'plan' }, 'plan');
+
+  // Streams the analysis, showing the text as it is generated
+  const runAnalysis = async (body, type) => {
     setLoading(true);
+    setRunning(true);
     setError(null);
-    setAnalysisType('plan');
-    
+    setSummary(null);
+    setAnalysisType(type);
+
     try {
-      const res = await api.post('/api/ai-assistant/analyze/', {
-        type: 'plan'
+      const result = await streamAnalysis(body, (text) => {
+        setSummary((current) => (current || '') + text);
+        setLoading(false);
       });
-      
-      setSummary(res.data.summary);
+      setSummary(result.summary);
     } catch (error) {
       console.error('AI analysis error:', error);
-      setError(error.response?.data?.error || 'Failed to generate analysis');
+      setSummary(null);
+      setError(error.response?.data?.error || error.message || 'Failed to generate analysis');
     } finally {
       setLoading(false);
+      setRunning(false);
     }
   };
 
@@ -142,7 +171,7 @@ const AIAssistant = forwardRef(({ user }, ref) => {
               
               <button
                 onClick={getOverallSummary}
-                disabled={loading}
+                disabled={running}
                 className="w-full flex items-center gap-3 p-4 rounded-lg bg-gradient-to-r from-purple-50 to-blue-50 dark:from-purple-900/20 dark:to-blue-900/20 hover:shadow-md transition group"
               >
                 <TrendingUp className="text-purple-600 dark:text-purple-400 group-hover:scale-110 transition" size={20} />
@@ -158,7 +187,7 @@ const AIAssistant = forwardRef(({ user }, ref) => {
 
               <button
                 onClick={getPlanAnalysis}
-                disabled={loading}
+                disabled={running}
                 className="w-full flex items-center gap-3 p-4 rounded-lg bg-gradient-to-r from-green-50 to-emerald-50 dark:from-green-900/20 dark:to-emerald-900/20 hover:shadow-md transition group"
               >
                 <FileText className="text-green-600 dark:text-green-400 group-hover:scale-110 transition" size={20} />